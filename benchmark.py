@@ -0,0 +1,972 @@
+# Benchmark the scraper offline against a local copy of books.toscrape.com
+import argparse
+import hashlib
+import html
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# The local server can take far more than the polite default rate
+UNTHROTTLED = ["--max-rate", "100000", "--host-concurrency", "1000"]
+sys.path.insert(0, HERE)
+RATINGS = ["One", "Two", "Three", "Four", "Five"]
+PAGE_SIZE = 20
+
+def write_file(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    mode = 'wb' if isinstance(content, bytes) else 'w'
+    with open(path, mode, **({} if mode == 'wb' else {'encoding': 'utf-8'})) as f:
+        f.write(content)
+
+def category_slug(index):
+    return f"category-{index}_{index + 2}"
+
+def book_slug(cat_index, book_index):
+    return f"book-{cat_index}-{book_index}_{cat_index * 1000 + book_index}"
+
+def book_title(cat_index, book_index):
+    # Includes characters that need escaping so the parsers are exercised properly
+    return f"Book {book_index} of Category {cat_index} & Friends' \"Tales\""
+
+def listing_card(c, b, prefix):
+    """One article.product_pod; prefix leads from the listing page back to catalogue/."""
+    title = html.escape(book_title(c, b))
+    rating = RATINGS[(c + b) % 5]
+    price = f"{10 + (c * 7 + b * 3) % 50}.{(b * 13) % 100:02d}"
+    return f"""<li class="col-xs-6 col-sm-4 col-md-3 col-lg-3"><article class="product_pod">
+<div class="image_container"><a href="{prefix}{book_slug(c, b)}/index.html"><img src="{prefix}../media/cache/{c}/{b}.jpg" alt="{title}" class="thumbnail"></a></div>
+<p class="star-rating {rating}"><i class="icon-star"></i></p>
+<h3><a href="{prefix}{book_slug(c, b)}/index.html" title="{title}">{title[:20]}...</a></h3>
+<div class="product_price"><p class="price_color">&pound;{price}</p>
+<p class="instock availability"><i class="icon-ok"></i>
+    In stock
+</p></div></article></li>"""
+
+def write_listing(folder, cards, title, page_name):
+    """Writes cards as numbered listing pages (index.html or page-1.html, then page-2.html, ...)."""
+    pages = max(1, -(-len(cards) // PAGE_SIZE))
+    for page in range(1, pages + 1):
+        pager = f'<li class="current">Page {page} of {pages}</li>'
+        if page < pages:
+            pager += f'<li class="next"><a href="page-{page + 1}.html">next</a></li>'
+        write_file(os.path.join(folder, page_name(page)), f"""<!DOCTYPE html>
+<html><head><title>{title} | Books to Scrape - Sandbox</title></head>
+<body><div class="page_inner"><ul class="breadcrumb"><li><a href="/index.html">Home</a></li>
+<li class="active">{title}</li></ul>
+<section><ol class="row">
+{chr(10).join(cards[(page - 1) * PAGE_SIZE:page * PAGE_SIZE])}
+</ol><div><ul class="pager">{pager}</ul></div></section></div></body></html>
+""")
+
+def build_fixture_site(root, categories=5, books_per_category=40, seed=1):
+    """Writes a miniature books.toscrape.com (sidebar, paginated category
+    listings, the site-wide catalogue/page-N.html listing, product pages and
+    cover images) under root."""
+    rng = random.Random(seed)
+    sidebar = []
+    for c in range(categories):
+        sidebar.append(f'<li><a href="catalogue/category/books/{category_slug(c)}/index.html">\n'
+                       f'    Category {c}\n</a></li>')
+    write_file(os.path.join(root, "index.html"), f"""<!DOCTYPE html>
+<html><head><title>All products | Books to Scrape - Sandbox</title></head>
+<body><div class="page_inner"><div class="row"><aside class="sidebar col-sm-4 col-md-3">
+<div class="side_categories"><ul class="nav nav-list"><li>
+<a href="catalogue/category/books_1/index.html">Books</a>
+<ul>
+{chr(10).join(sidebar)}
+</ul></li></ul></div></aside></div></div></body></html>
+""")
+
+    # The site-wide listing mixes the categories, like the real one
+    write_listing(os.path.join(root, "catalogue"),
+                  [listing_card(c, b, "") for b in range(books_per_category) for c in range(categories)],
+                  "All products", lambda page: f"page-{page}.html")
+
+    for c in range(categories):
+        cat_dir = os.path.join(root, "catalogue", "category", "books", category_slug(c))
+        write_listing(cat_dir, [listing_card(c, b, "../../../") for b in range(books_per_category)],
+                      f"Category {c}", lambda page: "index.html" if page == 1 else f"page-{page}.html")
+
+        for b in range(books_per_category):
+            title = html.escape(book_title(c, b))
+            rating = RATINGS[(c + b) % 5]
+            price = f"{10 + (c * 7 + b * 3) % 50}.{(b * 13) % 100:02d}"
+            stock = 1 + (c + b) % 22
+            upc = f"{rng.getrandbits(64):016x}"
+            description = html.escape(" ".join(rng.choice(["lorem", "ipsum", "dolor", "sit", "amet", "<b>", "&"])
+                                               for _ in range(120)))
+            write_file(os.path.join(root, "catalogue", book_slug(c, b), "index.html"), f"""<!DOCTYPE html>
+<html><head><title>{title} | Books to Scrape - Sandbox</title></head>
+<body id="default" class="default">
+<header class="header container-fluid"><div class="page_inner"><div class="row">
+<div class="col-sm-8 h1"><a href="../../index.html">Books to Scrape</a> We love being scraped!</div>
+</div></div></header>
+<div class="container-fluid page"><div class="page_inner">
+<ul class="breadcrumb">
+    <li><a href="../../index.html">Home</a></li>
+    <li><a href="../category/books_1/index.html">Books</a></li>
+    <li>
+        <a href="../category/books/{category_slug(c)}/index.html">Category {c}</a>
+    </li>
+    <li class="active">{title}</li>
+</ul>
+<div id="messages"></div>
+<div class="content"><div id="promotions"></div><div id="content_inner">
+<article class="product_page"><div class="row">
+<div class="col-sm-6"><div id="product_gallery" class="carousel"><div class="thumbnail"><div class="carousel-inner">
+<div class="item active"><img src="../../media/cache/{c}/{b}.jpg" alt="{title}" /></div>
+</div></div></div></div>
+<div class="col-sm-6 product_main">
+<h1>{title}</h1>
+<p class="price_color">&pound;{price}</p>
+<p class="instock availability"><i class="icon-ok"></i>
+    In stock ({stock} available)
+</p>
+<p class="star-rating {rating}"><i class="icon-star"></i></p>
+</div></div>
+<div id="product_description" class="sub-header"><h2>Product Description</h2></div>
+<p>{description} ...more</p>
+<div class="sub-header"><h2>Product Information</h2></div>
+<table class="table table-striped">
+<tr><th>UPC</th><td>{upc}</td></tr>
+<tr><th>Product Type</th><td>Books</td></tr>
+<tr><th>Price (excl. tax)</th><td>&pound;{price}</td></tr>
+<tr><th>Price (incl. tax)</th><td>&pound;{price}</td></tr>
+<tr><th>Tax</th><td>&pound;0.00</td></tr>
+<tr><th>Availability</th><td>In stock ({stock} available)</td></tr>
+<tr><th>Number of reviews</th><td>0</td></tr>
+</table>
+<div id="reviews"></div>
+</article></div></div></div></div></body></html>
+""")
+            # Cover images are random bytes; a few covers are shared on purpose
+            image = rng.randbytes(2000 + rng.randrange(20000)) if b % 10 else b"shared-cover" * 500
+            write_file(os.path.join(root, "media", "cache", str(c), f"{b}.jpg"), image)
+    return root
+
+class FixtureHandler(SimpleHTTPRequestHandler):
+    """Serves the fixture site with an artificial delay per request."""
+    # HTTP/1.1 so clients can keep connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Headers and body are sent separately; without this Nagle adds ~40ms per response
+    disable_nagle_algorithm = True
+    latency = 0.0
+    bandwidth = None  # bytes per second for each response body, None = unlimited
+
+    def do_GET(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.server.failure_rate and random.random() < self.server.failure_rate:
+            self.fail()
+            return
+        # Answer If-None-Match ourselves; SimpleHTTPRequestHandler already
+        # handles If-Modified-Since against the file's mtime
+        self.etag = None
+        path = self.translate_path(self.path)
+        if os.path.isfile(path):
+            stat = os.stat(path)
+            self.etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+            if self.headers.get("If-None-Match") == self.etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+        super().do_GET()
+
+    def fail(self):
+        """Misbehaves like an overloaded server: 503, 429 + Retry-After, or a dropped connection."""
+        kind = random.choice(["503", "429", "drop"])
+        self.close_connection = True
+        if kind == "drop":
+            return
+        self.send_response(int(kind))
+        if kind == "429":
+            self.send_header("Retry-After", "0.2")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def end_headers(self):
+        if getattr(self, "etag", None):
+            self.send_header("ETag", self.etag)
+        super().end_headers()
+
+    def copyfile(self, source, outputfile):
+        start = source.tell()
+        if self.bandwidth:
+            # Trickle the body out in small chunks, like a slow link would
+            while True:
+                chunk = source.read(4096)
+                if not chunk:
+                    break
+                outputfile.write(chunk)
+                time.sleep(len(chunk) / self.bandwidth)
+        else:
+            super().copyfile(source, outputfile)
+        self.server.count_bytes(source.tell() - start)
+
+    def log_message(self, format, *args):
+        pass
+
+class FixtureServer(ThreadingHTTPServer):
+    """Counts the TCP connections and body bytes served by the fixture site."""
+    connections = 0
+    bytes_sent = 0
+    failure_rate = 0.0  # share of requests that fail on purpose
+    lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+    def count_bytes(self, size):
+        with self.lock:
+            self.bytes_sent += size
+
+def serve(root, latency=0.0, bandwidth=None):
+    """Starts a local HTTP server for root; returns (server, site_root_url)."""
+    handler = type("Handler", (FixtureHandler,), {"latency": latency, "bandwidth": bandwidth})
+    server = FixtureServer(("127.0.0.1", 0), partial(handler, directory=root))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/"
+
+def load_scraper(site_root):
+    """Imports the book_scraper package with its URLs pointed at site_root."""
+    import book_scraper
+    book_scraper.config.set_site_root(site_root)
+    return book_scraper
+
+def bench_concurrency(args, site_root, server):
+    """Times the product pages fetched sequentially and with a worker pool."""
+    from concurrent.futures import ThreadPoolExecutor
+    scraper = load_scraper(site_root)
+    categories = scraper.get_categories()
+    book_urls = [url for cat_url in categories.values() for url in scraper.get_category_books(cat_url)]
+    print(f"{len(categories)} categories, {len(book_urls)} books, {args.latency * 1000:.0f}ms latency")
+
+    start = time.perf_counter()
+    sequential = [scraper.get_book_data(url) for url in book_urls]
+    sequential_time = time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        start = time.perf_counter()
+        concurrent = list(scraper.map_in_order(executor, scraper.get_book_data, book_urls, args.workers * 4))
+        concurrent_time = time.perf_counter() - start
+
+    assert concurrent == sequential, "concurrent results differ from the sequential path"
+    print(f"sequential:          {sequential_time:.2f}s ({len(book_urls) / sequential_time:.1f} pages/sec)")
+    print(f"{args.workers:>2} workers:          {concurrent_time:.2f}s ({len(book_urls) / concurrent_time:.1f} pages/sec)")
+    print(f"speedup:             {sequential_time / concurrent_time:.1f}x (identical, ordered output)")
+
+def bench_session(args, site_root, server):
+    """Compares bare requests.get with the pooled keep-alive session."""
+    import requests
+    scraper = load_scraper(site_root)
+    categories = scraper.get_categories()
+    book_urls = [url for cat_url in categories.values() for url in scraper.get_category_books(cat_url)]
+
+    for label, session in [("requests.get", requests), ("PooledSession", scraper.PooledSession())]:
+        server.connections = 0
+        start = time.perf_counter()
+        for url in book_urls:
+            scraper.get_book_data(url, session)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<14} {server.connections:>5} connections, "
+              f"{elapsed / len(book_urls) * 1000:.2f}ms per page")
+
+def product_pages(root):
+    """Yields (path, raw bytes) for every saved product page under root.
+
+    root can also be a folder written by --archive; its pages are yielded
+    as (URL, raw bytes).
+    """
+    if os.path.exists(os.path.join(root, "index.db")):
+        from book_scraper.archive import ArchiveReader
+        from book_scraper.extract import is_product_page
+        with ArchiveReader(root) as reader:
+            yield from ((url, bytes(page)) for url, page in reader if is_product_page(page))
+        return
+    for dirpath, _, filenames in sorted(os.walk(root)):
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if filename.endswith(".html") and "/catalogue/category/" not in path.replace(os.sep, "/"):
+                with open(path, 'rb') as f:
+                    content = f.read()
+                if b'id="product_description"' in content or b"product_page" in content:
+                    yield path, content
+
+def bench_parse(args, site_root, server):
+    """Checks the fast extractor matches BeautifulSoup and times both per page."""
+    scraper = load_scraper(site_root)
+    folder = args.pages or args.root
+    pages = list(product_pages(folder))
+    if not pages:
+        print("no product pages found")
+        return
+    for path, content in pages:
+        url = path if "://" in path else urllib.parse.urljoin(site_root,
+                                                              os.path.relpath(path, folder).replace(os.sep, "/"))
+        expected = scraper.extract_book_data(content, url)
+        actual = scraper.extract_book_data_fast(content, url)
+        assert actual == expected, f"parser mismatch for {path}:\n{expected}\n{actual}"
+    print(f"{len(pages)} product pages: fast parser output identical to BeautifulSoup")
+
+    for name in ("bs4", "fast"):
+        extract = scraper.PARSERS[name]
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for path, content in pages:
+                extract(content, site_root)
+        per_page = (time.perf_counter() - start) / (len(pages) * args.repeat)
+        print(f"{name:<5} {per_page * 1000:.3f}ms per page")
+
+def bench_processes(args, site_root, server):
+    """Extraction throughput in one process vs a ParsePool of 1..--processes processes."""
+    from concurrent.futures import ThreadPoolExecutor
+    scraper = load_scraper(site_root)
+    from book_scraper.extract import ParsePool
+    pages = [(content, site_root) for _, content in product_pages(args.root)] * args.repeat
+    if not pages:
+        print("no product pages found")
+        return
+    extract = scraper.PARSERS[scraper.config.DEFAULT_PARSER]
+    start = time.perf_counter()
+    expected = [extract(content, url) for content, url in pages]
+    baseline = len(pages) / (time.perf_counter() - start)
+    print(f"in-process     {baseline:8.0f} pages/sec ({os.cpu_count()} CPUs available)")
+    results = {"in_process_pages_per_second": round(baseline, 1)}
+    counts = sorted({1, 2, 4, args.processes} & set(range(1, args.processes + 1)))
+    for processes in counts:
+        pool = ParsePool(processes)
+        try:
+            # Enough feeding threads to keep every process busy with full batches
+            with ThreadPoolExecutor(max_workers=processes * pool.batch_size * 2) as threads:
+                start = time.perf_counter()
+                actual = list(threads.map(lambda page: pool(*page), pages))
+                rate = len(pages) / (time.perf_counter() - start)
+        finally:
+            pool.close()
+        assert actual == expected, "process pool results differ from in-process extraction"
+        print(f"{processes:>2} processes   {rate:8.0f} pages/sec ({rate / baseline:.1f}x)")
+        results[f"processes_{processes}_pages_per_second"] = round(rate, 1)
+    return results
+
+def run_main(scraper, argv, workdir):
+    """Runs the scraper's command line inside workdir, hiding its per-book output."""
+    import contextlib
+    import io
+    previous = os.getcwd()
+    os.chdir(workdir)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            start = time.perf_counter()
+            scraper.main(argv)
+            elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(previous)
+    return elapsed, output.getvalue()
+
+def bench_cache(args, site_root, server):
+    """Crawls the site twice; the second crawl should be served by 304s."""
+    scraper = load_scraper(site_root)
+    with tempfile.TemporaryDirectory() as workdir:
+        for label in ("cold cache", "warm cache"):
+            server.bytes_sent = 0
+            argv = ["site", "--no-state", "--workers", str(args.workers)] + UNTHROTTLED
+            elapsed, output = run_main(scraper, argv, workdir)
+            cache_line = next(line for line in output.splitlines() if line.startswith("HTTP cache"))
+            print(f"{label}: {elapsed:.2f}s, {server.bytes_sent / 1024:.0f} KB sent by server, {cache_line}")
+
+def bench_images(args, site_root, server):
+    """Full crawl with images downloaded inline vs on their own worker pool."""
+    scraper = load_scraper(site_root)
+    for label, image_workers in (("inline images", 0), ("image pipeline", args.workers)):
+        with tempfile.TemporaryDirectory() as workdir:
+            argv = ["site"] + UNTHROTTLED + ["--no-state", "--no-cache", "--workers", str(args.workers),
+                                             "--image-workers", str(image_workers)]
+            elapsed, output = run_main(scraper, argv, workdir)
+        images_line = next((line for line in output.splitlines() if line.startswith("Images")), "")
+        print(f"{label:<15} {elapsed:.2f}s {images_line}")
+
+def bench_pipeline(args, site_root, server):
+    """Listing-then-products, one category at a time vs the pipelined main()."""
+    import contextlib
+    import io
+    from concurrent.futures import ThreadPoolExecutor
+    scraper = load_scraper(site_root)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # The old order: walk all of a category's pagination, then its products
+        previous = os.getcwd()
+        os.chdir(workdir)
+        try:
+            os.makedirs("scraped_data/csv", exist_ok=True)
+            with contextlib.redirect_stdout(io.StringIO()), \
+                    ThreadPoolExecutor(max_workers=args.workers) as executor:
+                images = scraper.ImagePipeline(args.workers, scraper.default_session())
+                start = time.perf_counter()
+                first_row = None
+                for cat_name, cat_url in scraper.get_categories().items():
+                    book_urls = scraper.get_category_books(cat_url)
+                    with scraper.CsvSink(f"scraped_data/csv/{scraper.slugify(cat_name)}.csv") as sink:
+                        for data in scraper.scrape_books(book_urls, cat_name, executor,
+                                                       window=args.workers * 4, images=images):
+                            sink.write(data)
+                    first_row = first_row or sink.first_row_at
+                images.close()
+                staged = time.perf_counter() - start
+        finally:
+            os.chdir(previous)
+    print(f"staged:    first row {first_row - start:.2f}s, total {staged:.2f}s")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        argv = ["site", "--no-state", "--no-cache", "--workers", str(args.workers)] + UNTHROTTLED
+        elapsed, output = run_main(scraper, argv, workdir)
+    first_line = next(line for line in output.splitlines() if line.startswith("First row"))
+    print(f"pipelined: first row {first_line.split()[-1]}, total {elapsed:.2f}s")
+
+def bench_discovery(args, site_root, server):
+    """Walking every category's pagination vs the one site-wide catalogue listing."""
+    scraper = load_scraper(site_root)
+    results = {}
+    for label, extra in (("per category", []), ("global listing", ["--global-listing"])):
+        with tempfile.TemporaryDirectory() as workdir:
+            argv = ["site", "--no-state", "--no-cache", "--no-images", "--workers", str(args.workers)] + extra
+            elapsed, output = run_main(scraper, argv + UNTHROTTLED, workdir)
+            with open(os.path.join(workdir, "scraped_data", "metrics.json"), encoding='utf-8') as f:
+                summary = json.load(f)["counters"]
+        print(f"{label:<15} {elapsed:.2f}s, {summary['requests']} requests "
+              f"({summary.get('listing_pages', 0)} listing pages)")
+        results[label.replace(" ", "_") + "_requests"] = summary["requests"]
+    return results
+
+def bench_frontier(args, site_root, server):
+    """Peak memory of queueing 5x --rows book URLs (10% repeated) in a deque + set vs the Frontier."""
+    import tracemalloc
+    from collections import deque
+    scraper = load_scraper(site_root)
+    count = args.rows * 5
+    budget = max(args.rows // 10, 1)
+
+    def urls():
+        for i in range(count):
+            # Every tenth URL was already listed, as books in several listings are
+            n = i - 1 if i % 10 == 9 else i
+            yield f"{site_root}catalogue/book-{n // 1000}-{n % 1000}_{n}/index.html"
+
+    def order_digest(urls):
+        # Checks the order without keeping the URLs (a list of them would dwarf the frontier)
+        digest, n = hashlib.sha256(), 0
+        for url in urls:
+            digest.update(url.encode())
+            n += 1
+        return n, digest.hexdigest()
+
+    def in_memory():
+        seen, queue = set(), deque()
+        for url in urls():
+            if url not in seen:
+                seen.add(url)
+                queue.append(url)
+        return order_digest(queue.popleft() for _ in range(len(queue)))
+
+    def frontier(path):
+        with scraper.Frontier(path, budget) as queue:
+            for url in urls():
+                queue.push(url)
+            queue.finish()
+            return order_digest(queue.drain())
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        cases = (("deque + set", in_memory),
+                 (f"frontier ({budget} in memory)", lambda: frontier(os.path.join(workdir, "frontier.db"))))
+        order = None
+        for label, run in cases:
+            tracemalloc.start()
+            start = time.perf_counter()
+            found = run()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            order = order or found
+            assert found == order, "the frontier changed the URL order"
+            print(f"{label:<30} {elapsed:6.2f}s, {count / elapsed:8.0f} URLs/sec, "
+                  f"peak {peak / 2**20:7.1f} MB for {found[0]} unique URLs")
+            results[("frontier" if "frontier" in label else "in_memory") + "_peak_mb"] = round(peak / 2**20, 1)
+    return results
+
+def csv_files(folder):
+    """{file name: its rows, in order} for the CSVs in folder."""
+    files = {}
+    for name in os.listdir(folder):
+        with open(os.path.join(folder, name), encoding='utf-8') as f:
+            files[name] = f.readlines()
+    return files
+
+def bench_archive(args, site_root, server):
+    """Crawls once with --archive, then re-extracts the archived pages offline with reextract."""
+    scraper = load_scraper(site_root)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for compression in ("gzip", "none"):
+            archive = os.path.join(workdir, f"archive-{compression}")
+            argv = ["site", "--no-state", "--no-cache", "--no-images", "--workers", str(args.workers),
+                    "--archive", archive, "--archive-compression", compression]
+            crawled, _ = run_main(scraper, argv + UNTHROTTLED, workdir)
+            expected = csv_files(os.path.join(workdir, "scraped_data", "csv"))
+            size = sum(os.path.getsize(os.path.join(archive, name)) for name in os.listdir(archive)
+                       if ".warc" in name)
+            elapsed, _ = run_main(scraper, ["reextract", "--archive", archive], workdir)
+            assert csv_files(os.path.join(workdir, "scraped_data", "csv")) == expected, \
+                "re-extracted rows differ from the crawl, or are in another order"
+            run_main(scraper, ["reextract", "--archive", archive, "--parse-processes", "2"], workdir)
+            assert csv_files(os.path.join(workdir, "scraped_data", "csv")) == expected, \
+                "rows re-extracted in processes differ from the crawl, or are in another order"
+            pages = len(list(product_pages(archive)))
+            print(f"{compression:<5} archive {size / 1024:7.0f} KB: crawl {crawled:.2f}s, "
+                  f"reextract {elapsed:.2f}s ({pages / elapsed:.0f} pages/sec, {pages} pages)")
+            results[f"reextract_{compression}_pages_per_second"] = round(pages / elapsed)
+    return results
+
+def bench_mmap(args, site_root, server):
+    """Batch re-extraction input: one file per page vs memory-mapped archive segments."""
+    scraper = load_scraper(site_root)
+    from book_scraper.archive import ArchiveReader, PageArchive
+    from book_scraper.extract import is_product_page
+    paths = [path for path, _ in product_pages(args.root)] * args.repeat
+    if not paths:
+        print("no product pages found")
+        return
+    extract = scraper.PARSERS[scraper.config.DEFAULT_PARSER]
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        archives = {}
+        for compression in ("none", "gzip"):
+            archives[compression] = os.path.join(workdir, compression)
+            with PageArchive(archives[compression], compression) as archive:
+                for n, path in enumerate(paths):
+                    with open(path, 'rb') as f:
+                        archive.add(f"{site_root}page/{n}", f.read())
+
+        def files(parse):
+            for path in paths:
+                with open(path, 'rb') as f:
+                    content = f.read()
+                if is_product_page(content):
+                    parse(content)
+
+        def mapped(compression):
+            def run(parse):
+                with ArchiveReader(archives[compression]) as reader:
+                    for _, page in reader:
+                        if is_product_page(page):
+                            parse(page)
+                        page.release()
+            return run
+
+        cases = [("files", files), ("mmap plain", mapped("none")), ("mmap gzip", mapped("gzip"))]
+        for step, parse in (("read", len), ("read+extract", lambda page: extract(page, site_root))):
+            for label, run in cases:
+                start = time.perf_counter()
+                run(parse)
+                rate = len(paths) / (time.perf_counter() - start)
+                print(f"{step:<13} {label:<11} {rate:10.0f} pages/sec")
+                results[f"{step.replace('+', '_')}_{label.replace(' ', '_')}_pages_per_second"] = round(rate)
+    return results
+
+def bench_async(args, site_root, server):
+    """Worker threads vs --async against a far-away site (at least 250ms per response)."""
+    scraper = load_scraper(site_root)
+    try:
+        import aiohttp  # noqa: F401
+    except ImportError:
+        print("aiohttp is not installed (pip install aiohttp); skipping")
+        return
+    slow_server, slow_root = serve(args.root, max(args.latency, 0.25))
+    results = {}
+    try:
+        for label, mode in ((f"{args.workers} threads", ["--workers", str(args.workers)]),
+                            ("async", ["--async"])):
+            with tempfile.TemporaryDirectory() as workdir:
+                argv = ["site", "--no-state", "--no-cache", "--site-root", slow_root] + mode + UNTHROTTLED
+                elapsed, output = run_main(scraper, argv, workdir)
+            books = int(next(line for line in output.splitlines() if line.startswith("Scraped")).split()[1])
+            print(f"{label:<12} {elapsed:6.2f}s ({books / elapsed:6.1f} books/sec)")
+            results[label.split()[-1] + "_seconds"] = round(elapsed, 3)
+    finally:
+        slow_server.shutdown()
+        scraper.config.set_site_root(site_root)
+    return results
+
+def bench_flaky(args, site_root, server):
+    """Crawls while the server randomly fails; every book should still be saved."""
+    scraper = load_scraper(site_root)
+    server.failure_rate = args.failure_rate
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            argv = ["site", "--no-state", "--no-cache", "--workers", str(args.workers), "--retries", "8"] + UNTHROTTLED
+            elapsed, output = run_main(scraper, argv, workdir)
+            csv_folder = os.path.join(workdir, "scraped_data", "csv")
+            rows = 0
+            for name in os.listdir(csv_folder):
+                with open(os.path.join(csv_folder, name), encoding='utf-8') as f:
+                    rows += sum(1 for _ in f) - 1
+    finally:
+        server.failure_rate = 0.0
+    scheduler_line = next(line for line in output.splitlines() if line.startswith("Scheduler"))
+    print(f"{args.failure_rate:.0%} of requests failing: {rows} of {args.categories * args.books} books saved "
+          f"in {elapsed:.2f}s")
+    print(scheduler_line)
+
+def bench_delta(args, site_root, server):
+    """Re-crawls an unchanged site, then one with a changed price, using --skip-unchanged."""
+    scraper = load_scraper(site_root)
+    product = os.path.join(args.root, "catalogue", book_slug(0, 0), "index.html")
+    listing = os.path.join(args.root, "catalogue", "category", "books", category_slug(0), "index.html")
+    with tempfile.TemporaryDirectory() as workdir:
+        argv = ["site", "--no-images", "--no-cache", "--skip-unchanged", "--workers", str(args.workers)] + UNTHROTTLED
+        for label in ("first crawl", "nothing changed", "one price changed"):
+            if label == "one price changed":
+                for path in (product, listing):
+                    with open(path, encoding='utf-8') as f:
+                        text = f.read()
+                    write_file(path, text.replace("&pound;10.00", "&pound;12.34"))
+            elapsed, output = run_main(scraper, argv, workdir)
+            requests_line = next(line for line in output.splitlines() if line.endswith("connections"))
+            changes_line = next(line for line in output.splitlines() if line.startswith("Changes"))
+            print(f"{label:<18} {elapsed:.2f}s, {requests_line.split(' over ')[0]}; {changes_line.split(' -> ')[0]}")
+
+def synthetic_books(count):
+    """Yields `count` text records shaped like the scraper's original dict rows
+    (Book.from_text turns one into a Book)."""
+    for i in range(count):
+        yield {
+            "product_page_url": f"http://books.toscrape.com/catalogue/book-{i}_{i}/index.html",
+            "universal_product_code": f"{i:016x}",
+            "title": f"Synthetic Book {i}",
+            "price_including_tax": f"£{10 + i % 50}.{i % 100:02d}",
+            "price_excluding_tax": f"£{10 + i % 50}.{i % 100:02d}",
+            "number_available": f"In stock ({i % 22 + 1} available)",
+            "product_description": "lorem ipsum dolor sit amet " * 40,
+            "category": f"Category {i % 50}",
+            "review_rating": RATINGS[i % 5],
+            "image_url": f"http://books.toscrape.com/media/cache/{i % 256:02x}/{i}.jpg",
+        }
+
+def bench_sink(args, site_root, server):
+    """Peak memory of collecting a category in a list vs streaming it to CsvSink."""
+    import csv
+    import tracemalloc
+    scraper = load_scraper(site_root)
+
+    def collect_then_write(filename):
+        rows = list(synthetic_books(args.rows))
+        with open(filename, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=rows[0].keys())
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def stream(filename):
+        with scraper.CsvSink(filename) as sink:
+            for row in synthetic_books(args.rows):
+                sink.write(scraper.Book.from_text(row))
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, write in (("list + DictWriter", collect_then_write), ("CsvSink", stream)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            write(os.path.join(workdir, "books.csv"))
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:<18} {args.rows} rows: peak {peak / 2**20:7.1f} MB, {elapsed:.2f}s")
+
+def bench_records(args, site_root, server):
+    """Memory per record and sink throughput: the old text dicts vs Book records."""
+    import csv
+    import tracemalloc
+    scraper = load_scraper(site_root)
+    sinks = scraper.sinks
+
+    def retained(build):
+        tracemalloc.start()
+        records = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return records, size / len(records)
+
+    dicts, dict_bytes = retained(lambda: list(synthetic_books(args.rows)))
+    books, book_bytes = retained(lambda: [scraper.Book.from_text(row) for row in synthetic_books(args.rows)])
+    assert [book.text() for book in books[:1000]] == dicts[:1000], "Book.text() differs from the text record"
+    print(f"memory per record: dict {dict_bytes:6.0f} B, Book {book_bytes:6.0f} B "
+          f"({1 - book_bytes / dict_bytes:.0%} smaller, {args.rows} records)")
+    results = {"dict_bytes_per_record": round(dict_bytes), "book_bytes_per_record": round(book_bytes)}
+
+    def dict_csv(path):
+        # What CsvSink did before: a DictWriter over the text rows, timed per row the same way
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=dicts[0].keys())
+            writer.writeheader()
+            for row in dicts:
+                with scraper.METRICS.time("write"):
+                    writer.writerow(row)
+                scraper.METRICS.count("rows_written")
+
+    def dict_parquet(path):
+        # What ParquetSink did before: parse every text row, then build batches row-wise
+        pa = sinks.import_pyarrow()
+        import pyarrow.parquet
+        schema = sinks.arrow_schema(scraper.BOOK_FIELDS)
+        with pyarrow.parquet.ParquetWriter(path, schema, compression="zstd") as writer:
+            for start in range(0, len(dicts), 1000):
+                writer.write_batch(pa.RecordBatch.from_pylist(
+                    [sinks.typed_row(row) for row in dicts[start:start + 1000]], schema=schema))
+
+    def book_sink(sink_class):
+        def write(path):
+            with sink_class(path) as sink:
+                for book in books:
+                    sink.write(book)
+        return write
+
+    cases = [("csv", "dict", dict_csv), ("csv", "Book", book_sink(sinks.CsvSink))]
+    try:
+        sinks.import_pyarrow()
+        cases += [("parquet", "dict", dict_parquet), ("parquet", "Book", book_sink(sinks.ParquetSink))]
+    except ImportError as e:
+        print(f"{e}; skipping parquet")
+    with tempfile.TemporaryDirectory() as workdir:
+        for output, label, write in cases:
+            start = time.perf_counter()
+            write(os.path.join(workdir, f"{label}.{output}"))
+            rate = len(books) / (time.perf_counter() - start)
+            print(f"{output:<8} {label:<5} {rate:10.0f} rows/sec")
+            results[f"{output}_{label.lower()}_rows_per_second"] = round(rate)
+    return results
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB."""
+    # On Linux ru_maxrss survives exec, so a child would inherit the parent's
+    # peak; VmHWM belongs to this process image alone
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    import resource
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def end_to_end_run(site_root, workers, workdir):
+    """Runs get_categories -> get_category_books -> get_book_data -> download_image
+    over the whole site and measures it. Meant to run in its own process so
+    peak RSS belongs to this run alone."""
+    from concurrent.futures import ThreadPoolExecutor
+    scraper = load_scraper(site_root)
+    os.chdir(workdir)
+    store = scraper.ImageStore(os.path.join(workdir, "images"))
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    books = images = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for cat_name, cat_url in scraper.get_categories().items():
+            book_urls = scraper.get_category_books(cat_url)
+            for data in executor.map(scraper.get_book_data, book_urls):
+                if data is None:
+                    continue
+                books += 1
+                saved = scraper.download_image(data.image_url, cat_name, data.title,
+                                             data.universal_product_code, store=store)
+                images += saved is not None
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+    store.close()
+    peak_mb = peak_rss_mb()
+    pages = scraper.METRICS.summary()["counters"].get("requests", 0)
+    return {
+        "books": books,
+        "images": images,
+        "requests": pages,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "pages_per_second": round(pages / wall, 2),
+        "cpu_ms_per_page": round(cpu / pages * 1000, 3) if pages else None,
+        "peak_rss_mb": round(peak_mb, 1),
+    }
+
+def bench_end_to_end(args, site_root, server):
+    """The whole scrape, each repeat in a fresh process; the median run is reported."""
+    runs = []
+    for _ in range(args.repeat):
+        with tempfile.TemporaryDirectory() as workdir:
+            child = subprocess.run([sys.executable, os.path.abspath(__file__), "--end-to-end-child", site_root,
+                                    "--workers", str(args.workers), "--workdir", workdir],
+                                   capture_output=True, text=True, check=True)
+        # The child's per-book output comes first; its result is the last line
+        runs.append(json.loads(child.stdout.strip().splitlines()[-1]))
+    runs.sort(key=lambda run: run["wall_seconds"])
+    result = dict(runs[len(runs) // 2])
+    result["wall_seconds_runs"] = [run["wall_seconds"] for run in runs]
+    result["wall_seconds_stdev"] = round(statistics.pstdev(result["wall_seconds_runs"]), 3)
+    print(f"{result['books']} books, {result['images']} images, {result['requests']} requests "
+          f"in {result['wall_seconds']:.2f}s (median of {len(runs)})")
+    print(f"{result['pages_per_second']:.1f} pages/sec, {result['cpu_seconds']:.2f}s CPU "
+          f"({result['cpu_ms_per_page']:.2f}ms per page), peak RSS {result['peak_rss_mb']:.1f} MB")
+    return result
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path):
+    """Prints how the numbers moved since a results file saved from another commit."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline["settings"] != results["settings"]:
+        print("warning: the baseline was measured with different settings")
+    print(f"\n== compared with {baseline.get('commit') or baseline_path} ==")
+    for name, values in results["benchmarks"].items():
+        before = baseline["benchmarks"].get(name) or {}
+        for key, value in values.items():
+            old = before.get(key)
+            if isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+                print(f"{name}.{key:<20} {old:>10} -> {value:<10} ({(value - old) / old:+.1%})")
+
+def bench_formats(args, site_root, server):
+    """Writes the synthetic catalogue as CSV, Parquet and Arrow, then loads it back typed."""
+    import csv
+    scraper = load_scraper(site_root)
+    sinks = scraper.sinks
+    try:
+        pa = sinks.import_pyarrow()
+    except ImportError as e:
+        print(e)
+        return
+    import pyarrow.parquet
+
+    def load_csv(path):
+        # What every consumer of the CSVs has to do: read the text, then parse the numbers
+        with open(path, newline='', encoding='utf-8') as f:
+            return [sinks.typed_row(row) for row in csv.DictReader(f)]
+
+    loaders = {
+        "csv": load_csv,
+        "parquet": pyarrow.parquet.read_table,
+        "arrow": lambda path: pa.ipc.open_file(path).read_all(),
+    }
+    books = [scraper.Book.from_text(row) for row in synthetic_books(args.rows)]
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, (sink_class, extension) in sinks.SINKS.items():
+            path = os.path.join(workdir, "books" + extension)
+            start = time.perf_counter()
+            with sink_class(path) as sink:
+                for book in books:
+                    sink.write(book)
+            write_time = time.perf_counter() - start
+            start = time.perf_counter()
+            loaders[name](path)
+            load_time = time.perf_counter() - start
+            print(f"{name:<8} {args.rows} rows: write {write_time:.2f}s, load typed {load_time * 1000:8.1f}ms, "
+                  f"{os.path.getsize(path) / 2**20:6.1f} MB")
+
+BENCHMARKS = {
+    "concurrency": bench_concurrency,
+    "session": bench_session,
+    "parse": bench_parse,
+    "processes": bench_processes,
+    "cache": bench_cache,
+    "sink": bench_sink,
+    "records": bench_records,
+    "images": bench_images,
+    "pipeline": bench_pipeline,
+    "discovery": bench_discovery,
+    "frontier": bench_frontier,
+    "archive": bench_archive,
+    "mmap": bench_mmap,
+    "async": bench_async,
+    "flaky": bench_flaky,
+    "formats": bench_formats,
+    "delta": bench_delta,
+    "end_to_end": bench_end_to_end,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks")
+    parser.add_argument("benchmarks", nargs="*", metavar="benchmark",
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--categories", type=int, default=5)
+    parser.add_argument("--books", type=int, default=40, help="books per category")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every response")
+    parser.add_argument("--bandwidth", type=float,
+                        help="KB/s each response body is sent at (default: as fast as possible)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="most parsing processes for the processes benchmark")
+    parser.add_argument("--pages", help="folder of saved product pages (or an --archive folder) to check the "
+                                        "parsers against")
+    parser.add_argument("--failure-rate", type=float, default=0.2, help="failing requests for the flaky benchmark")
+    parser.add_argument("--rows", type=int, default=100_000, help="synthetic rows for the sink and records benchmarks (x5 URLs for frontier)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="passes over the pages when timing parsers, runs of the end-to-end benchmark")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the generated site")
+    parser.add_argument("--output", help="save the measured results as JSON (to compare commits later)")
+    parser.add_argument("--compare", metavar="RESULTS", help="JSON saved by --output on another commit")
+    parser.add_argument("--end-to-end-child", metavar="SITE_ROOT", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.end_to_end_child:
+        print(json.dumps(end_to_end_run(args.end_to_end_child, args.workers, args.workdir)))
+        return
+    unknown = set(args.benchmarks) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    results = {
+        "commit": git_commit(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"categories": args.categories, "books": args.books, "latency": args.latency,
+                     "bandwidth": args.bandwidth, "workers": args.workers, "seed": args.seed},
+        "benchmarks": {},
+    }
+    with tempfile.TemporaryDirectory() as root:
+        args.root = root
+        build_fixture_site(root, args.categories, args.books, args.seed)
+        bandwidth = args.bandwidth * 1024 if args.bandwidth else None
+        server, site_root = serve(root, args.latency, bandwidth)
+        try:
+            for name in args.benchmarks or BENCHMARKS:
+                print(f"\n== {name} ==")
+                result = BENCHMARKS[name](args, site_root, server)
+                if result:
+                    results["benchmarks"][name] = result
+        finally:
+            server.shutdown()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    sys.exit(main())
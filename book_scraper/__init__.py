@@ -0,0 +1,61 @@
+"""Scraper for books.toscrape.com: one package behind the phase scripts and the CLI.
+
+The names below are imported on first use, so `import book_scraper` stays
+cheap; requests and BeautifulSoup are only loaded by the code that needs them.
+"""
+import importlib
+
+_EXPORTS = {
+    "config": None,
+    "sinks": None,
+    "main": "cli",
+    "get_categories": "crawl",
+    "get_category_books": "crawl",
+    "iter_category_books": "crawl",
+    "iter_category_cards": "crawl",
+    "get_book_data": "crawl",
+    "scrape_book": "crawl",
+    "scrape_books": "crawl",
+    "crawl_category": "crawl",
+    "map_in_order": "crawl",
+    "Frontier": "frontier",
+    "PageArchive": "archive",
+    "ArchiveReader": "archive",
+    "AsyncSession": "aio",
+    "get_categories_async": "aio",
+    "get_category_books_async": "aio",
+    "get_book_data_async": "aio",
+    "download_image_async": "aio",
+    "crawl_async": "aio",
+    "extract_book_data": "extract",
+    "extract_book_data_fast": "extract",
+    "parse_listing_card": "extract",
+    "extract_page": "extract",
+    "PARSERS": "extract",
+    "ExtractionPlan": "plans",
+    "Field": "plans",
+    "Book": "book",
+    "BOOK_FIELDS": "book",
+    "PooledSession": "fetch",
+    "HttpCache": "fetch",
+    "RequestScheduler": "fetch",
+    "default_session": "fetch",
+    "ImageStore": "images",
+    "ImagePipeline": "images",
+    "download_image": "images",
+    "CrawlState": "state",
+    "Catalogue": "catalogue",
+    "CsvSink": "sinks",
+    "METRICS": "metrics",
+    "slugify": "utils",
+}
+
+__all__ = sorted(_EXPORTS)
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module 'book_scraper' has no attribute {name!r}")
+    module = importlib.import_module(f".{_EXPORTS[name] or name}", __name__)
+    value = module if _EXPORTS[name] is None else getattr(module, name)
+    globals()[name] = value
+    return value
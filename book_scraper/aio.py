@@ -0,0 +1,444 @@
+"""Asynchronous crawl: every request of the crawl in flight on one asyncio event loop.
+
+A waiting request costs a coroutine and a socket rather than a thread, so
+thousands can be in flight at once. Parsing still runs in an executor so
+it never blocks the loop. Needs aiohttp (pip install aiohttp).
+"""
+import asyncio
+import contextlib
+import hashlib
+import itertools
+import os
+import signal
+import time
+import urllib.parse
+from collections import deque
+
+from . import config
+from .config import (ASYNC_CONCURRENCY, HOST_CONCURRENCY, IMAGE_CHUNK_SIZE, MAX_RATE, MAX_RETRIES,
+                     REQUEST_TIMEOUT, RETRY_STATUSES)
+from .crawl import catalogue_url, parse_categories, read_listing_page
+from .extract import book_link, extract_page, parse_listing_card
+from .fetch import HostThrottle, backoff_delay, retry_after
+from .frontier import Frontier
+from .metrics import METRICS
+from .sinks import open_sink
+from .utils import slugify
+
+_download_ids = itertools.count()
+
+def import_aiohttp():
+    """aiohttp is only needed for --async, so it is imported on demand."""
+    try:
+        import aiohttp
+    except ImportError:
+        raise ImportError("--async needs aiohttp: pip install aiohttp") from None
+    return aiohttp
+
+class AsyncHostThrottle(HostThrottle):
+    """HostThrottle for the event loop: the same adaptive rate and in-flight
+    cap, but waiting requests await instead of blocking a thread.
+
+    Everything runs on the loop's thread, so no lock is needed.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiters = []
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.refill(now)
+            if now < self.paused_until:
+                await asyncio.sleep(self.paused_until - now)
+            elif self.in_flight >= self.concurrency:
+                waiter = asyncio.get_running_loop().create_future()
+                self.waiters.append(waiter)
+                await waiter
+            elif self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+            else:
+                self.tokens -= 1
+                self.in_flight += 1
+                return
+
+    def release(self, latency, ok):
+        self.in_flight -= 1
+        self.adapt(latency, ok)
+        waiters, self.waiters = self.waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def pause(self, seconds):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class AsyncSession:
+    """An aiohttp session with one concurrency limit for the whole crawl.
+
+    At most `concurrency` requests are in flight, and each host gets an
+    AsyncHostThrottle: at most `host_concurrency` of them go to it, at a
+    rate that adapts below max_rate per second as with PooledSession.
+    Connection errors, timeouts and 429/5xx responses are retried like
+    RequestScheduler does.
+    With an HttpCache GET requests are conditional, and with a PageArchive
+    every page read by get() is archived, as with PooledSession.
+    Use it as `async with AsyncSession() as session:` inside the event loop.
+    """
+
+    def __init__(self, concurrency=ASYNC_CONCURRENCY, max_rate=MAX_RATE, retries=MAX_RETRIES,
+                 timeout=REQUEST_TIMEOUT, cache=None, archive=None, host_concurrency=HOST_CONCURRENCY):
+        self.aiohttp = import_aiohttp()
+        self.concurrency = concurrency
+        self.max_rate = max_rate
+        self.host_concurrency = host_concurrency
+        self.retries = retries
+        self.timeout = timeout
+        self.cache = cache
+        self.archive = archive
+        self.session = None
+        self.semaphore = None
+        self.hosts = {}  # host -> AsyncHostThrottle
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.retried = 0
+
+    async def __aenter__(self):
+        aiohttp = self.aiohttp
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.concurrency),
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    def throttle(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self.hosts:
+            self.hosts[host] = AsyncHostThrottle(self.max_rate, self.host_concurrency)
+        return self.hosts[host]
+
+    async def _send(self, url, headers):
+        throttle = self.throttle(url)
+        for attempt in range(self.retries + 1):
+            await throttle.acquire()
+            started = time.monotonic()
+            try:
+                response = await self.session.get(url, headers=headers)
+            except (self.aiohttp.ClientError, asyncio.TimeoutError):
+                throttle.release(time.monotonic() - started, ok=False)
+                if attempt == self.retries:
+                    raise
+                delay = backoff_delay(attempt)
+            except BaseException:
+                throttle.release(time.monotonic() - started, ok=False)
+                raise
+            else:
+                ok = response.status not in RETRY_STATUSES
+                throttle.release(time.monotonic() - started, ok)
+                if ok or attempt == self.retries:
+                    return response
+                delay = retry_after(response.headers)
+                if delay is not None:
+                    throttle.pause(delay)
+                else:
+                    delay = backoff_delay(attempt)
+                response.release()
+            self.retried += 1
+            await asyncio.sleep(delay)
+
+    @contextlib.asynccontextmanager
+    async def request(self, url, headers=None):
+        """Sends a GET under the crawl's limits; the response can be streamed inside the block."""
+        async with self.semaphore:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            try:
+                response = await self._send(url, headers or {})
+                METRICS.count("requests")
+                try:
+                    yield response
+                finally:
+                    response.release()
+            finally:
+                self.in_flight -= 1
+
+    async def get(self, url):
+        """The body of url (raises for error statuses)."""
+        with METRICS.time("fetch"):
+            body = await self._get(url)
+        if self.archive:
+            self.archive.add(url, body)
+        return body
+
+    async def _get(self, url):
+        validators = self.cache.validators(url) if self.cache else {}
+        async with self.request(url, validators) as response:
+            if response.status == 304 and validators:
+                body = self.cache.load(url)
+                if body is not None:
+                    self.cache.record(True, len(body))
+                    METRICS.count("bytes_from_cache", len(body))
+                    return body
+            else:
+                response.raise_for_status()
+                body = await response.read()
+                METRICS.count("bytes_received", len(body))
+                if self.cache:
+                    self.cache.record(False)
+                    self.cache.store(url, response.headers, body)
+                return body
+        # The cached body went missing, so ask again without validators
+        async with self.request(url) as response:
+            response.raise_for_status()
+            body = await response.read()
+            METRICS.count("bytes_received", len(body))
+            return body
+
+    def report(self):
+        return (f"Async: {self.peak_in_flight} requests in flight at most (limit {self.concurrency}), "
+                f"{self.retried} retries")
+
+async def in_executor(executor, fn, *args):
+    """Runs fn(*args) on executor (the loop's default one when None) without blocking the loop."""
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+async def map_in_order_async(fn, items, window):
+    """map_in_order on the event loop: yields await fn(item) for every item of an async iterable,
+    in order, with at most `window` tasks started and not yet handed over."""
+    pending = deque()
+    try:
+        async for item in items:
+            pending.append(asyncio.ensure_future(fn(item)))
+            if len(pending) >= window:
+                yield await pending.popleft()
+            # Hand over anything already finished without waiting for the window to fill
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for task in pending:
+            task.cancel()
+
+async def get_categories_async(session, executor=None):
+    return await in_executor(executor, parse_categories, await session.get(config.BASE_SITE_URL))
+
+async def iter_listing_pages_async(category_url, session, executor=None):
+    """Yields (page url, cards) for each listing page of a category, like iter_listing_pages."""
+    current_url = category_url
+    while current_url:
+        articles, next_url = await in_executor(executor, read_listing_page, await session.get(current_url),
+                                               current_url)
+        yield current_url, articles
+        current_url = next_url
+
+async def get_category_books_async(category_url, session, executor=None):
+    return [book_link(article) async for _, articles in iter_listing_pages_async(category_url, session, executor)
+            for article in articles]
+
+async def get_book_data_async(book_url, session, parser=None, executor=None):
+    """Fetches one product page and extracts its Book in the executor (None on failure)."""
+    try:
+        content = await session.get(book_url)
+        METRICS.count("product_pages")
+        return await in_executor(executor, extract_page, content, book_url, parser)
+    except Exception as e:
+        print(f"Error scraping {book_url}: {e}")
+        return None
+
+async def download_image_async(img_url, category_name, book_title, upc, session, store, verify=False):
+    """download_image on the event loop: streamed into the ImageStore in chunks.
+
+    Returns the number of bytes downloaded (0 when the image was already
+    stored) or None if the download failed.
+    """
+    try:
+        sha256 = store.known_hash(img_url, verify)
+        downloaded = 0
+        if sha256 is None:
+            # Many downloads share this thread, so each gets its own temporary file
+            tmp_path = os.path.join(store.objects, f"incoming-async-{os.getpid()}-{next(_download_ids)}.part")
+            digest = hashlib.sha256()
+            try:
+                async with session.request(img_url) as response:
+                    response.raise_for_status()
+                    with open(tmp_path, 'wb') as handler, METRICS.time("image_download"):
+                        async for chunk in response.content.iter_chunked(IMAGE_CHUNK_SIZE):
+                            handler.write(chunk)
+                            digest.update(chunk)
+                            downloaded += len(chunk)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            sha256 = digest.hexdigest()
+            with METRICS.time("image_save"):
+                store.add(tmp_path, sha256)
+        with METRICS.time("image_save"):
+            store.link(img_url, sha256, category_name, book_title, upc)
+        METRICS.count("images_saved")
+        METRICS.count("image_bytes", downloaded)
+        return downloaded
+    except Exception as e:
+        print(f"Failed to download image for {book_title}: {e}")
+        return None
+
+async def scrape_book_async(book_url, category_name, session, parser=None, executor=None, images=None):
+    """Scrapes one product page and, given an ImagePipeline, downloads its cover into its store.
+
+    With no category_name the book goes under the category of its breadcrumb.
+    """
+    data = await get_book_data_async(book_url, session, parser, executor)
+    if data:
+        category_name = category_name or data.category
+        if images:
+            images.record(await download_image_async(data.image_url, category_name, data.title,
+                                                     data.universal_product_code, session, images.store,
+                                                     images.verify))
+        print(f"  > Scraped: {data.title[:30]}...")
+    return data
+
+async def crawl_category_async(cat_name, cat_url, session, executor=None, parser=None, images=None, fields=None,
+                               listing_only=False, output_format="csv", catalogue=None, sinks=None,
+                               window=ASYNC_CONCURRENCY):
+    """crawl_category on the event loop.
+
+    A task is started for every book as soon as its listing page is read,
+    with at most `window` of them started and not yet written; the rows are
+    written in listing order as the oldest finishes. The sink is added to
+    `sinks` when it opens, so a cancelled crawl can still report it.
+    """
+    print(f"\n--- Processing: {cat_name} ---")
+
+    async def book_urls():
+        async for _, articles in iter_listing_pages_async(cat_url, session, executor):
+            for article in articles:
+                yield book_link(article)
+
+    def scrape(url):
+        return scrape_book_async(url, cat_name, session, parser, executor, images)
+
+    with open_sink(output_format, slugify(cat_name), listing_only, catalogue, fields) as sink:
+        if sinks is not None:
+            sinks.append(sink)
+        if listing_only:
+            async for page_url, articles in iter_listing_pages_async(cat_url, session, executor):
+                for article in articles:
+                    sink.write(parse_listing_card(article, page_url, cat_name))
+        else:
+            books = map_in_order_async(scrape, book_urls(), window)
+            try:
+                async for data in books:
+                    if data:
+                        sink.write(data)
+            finally:
+                await books.aclose()  # cancels the books still in flight
+    return sink
+
+async def drain_async(frontier, pushed):
+    """Frontier.drain on the event loop: yields URLs as they are pushed, waiting on
+    the asyncio.Event `pushed` (set after every push) instead of blocking the loop."""
+    while True:
+        url = frontier.pop(timeout=0)
+        if url is not None:
+            yield url
+        elif frontier.finished and not len(frontier):
+            return
+        else:
+            pushed.clear()
+            await pushed.wait()
+
+async def crawl_catalogue_async(session, executor=None, parser=None, images=None, fields=None,
+                                output_format="csv", catalogue=None, sinks=None, window=ASYNC_CONCURRENCY,
+                                frontier=None):
+    """crawl_catalogue on the event loop: every book once, from the site-wide listing.
+
+    A discovery task walks the listing into a Frontier (a new one unless
+    given) while at most `window` books are fetched at a time from it, so
+    memory stays bounded however many books the site has. Sinks are opened
+    per breadcrumb category as their first book arrives and added to `sinks`.
+    """
+    print("\n--- Processing: every book, from the site-wide listing ---")
+    if frontier is None:
+        frontier = Frontier()
+    pushed = asyncio.Event()
+
+    async def discover():
+        try:
+            async for _, articles in iter_listing_pages_async(catalogue_url(), session, executor):
+                for article in articles:
+                    frontier.push(book_link(article))
+                pushed.set()
+        finally:
+            frontier.finish()
+            pushed.set()
+
+    def scrape(url):
+        return scrape_book_async(url, None, session, parser, executor, images)
+
+    by_category = {}
+    with frontier, contextlib.ExitStack() as stack:
+        found = asyncio.ensure_future(discover())
+        books = map_in_order_async(scrape, drain_async(frontier, pushed), window)
+        try:
+            async for data in books:
+                if not data:
+                    continue
+                if data.category not in by_category:
+                    sink = stack.enter_context(open_sink(output_format, slugify(data.category), False, catalogue,
+                                                         fields))
+                    by_category[data.category] = sink
+                    if sinks is not None:
+                        sinks.append(sink)
+                by_category[data.category].write(data)
+            await found  # a listing page that failed fails the crawl, as in a category crawl
+        finally:
+            await books.aclose()
+            found.cancel()
+    print(frontier.report())
+    return list(by_category.values())
+
+async def crawl_async(categories, session, executor=None, parser=None, images=None, fields=None,
+                      listing_only=False, output_format="csv", catalogue=None, global_listing=False,
+                      window=ASYNC_CONCURRENCY, frontier=None):
+    """Crawls every category at once; returns (their sinks, whether the crawl was cancelled).
+
+    Each category keeps at most `window` books started and not yet written.
+    With global_listing the books are found on the site-wide listing
+    instead, through frontier (see crawl_catalogue_async).
+
+    Ctrl-C or SIGTERM cancels the crawl cleanly: books still in flight are
+    dropped, the files being written keep their rows as '.part' files and
+    every finished category is written out as usual.
+    """
+    sinks = []
+    loop = asyncio.get_running_loop()
+    crawl = asyncio.current_task()
+    handled = []
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, crawl.cancel)
+            handled.append(signum)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass  # Windows, or not the main thread
+    if global_listing:
+        categories_done = [crawl_catalogue_async(session, executor, parser, images, fields, output_format, catalogue,
+                                                 sinks, window, frontier)]
+    else:
+        categories_done = [crawl_category_async(name, url, session, executor, parser, images, fields,
+                                                listing_only, output_format, catalogue, sinks, window)
+                           for name, url in categories.items()]
+    try:
+        await asyncio.gather(*categories_done)
+        return sinks, False
+    except asyncio.CancelledError:
+        if hasattr(crawl, "uncancel"):
+            crawl.uncancel()  # handled here, so the session can still close (Python 3.11+)
+        print("\nCrawl cancelled; unfinished categories are left as .part files.")
+        return sinks, True
+    finally:
+        for signum in handled:
+            loop.remove_signal_handler(signum)
@@ -0,0 +1,310 @@
+"""Raw page archive: every fetched page kept in WARC-style segment files, for offline re-extraction."""
+import gzip
+import itertools
+import mmap
+import os
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+import uuid
+import zlib
+
+from .config import ARCHIVE_COMPRESSION, ARCHIVE_DIR, ARCHIVE_SEGMENT_SIZE, DEFAULT_PARSER, PARSE_BATCH_SIZE
+from .metrics import METRICS
+
+COMPRESSIONS = ("gzip", "none")
+LISTING_PAGE = re.compile(rb'class="product_pod"')
+SEGMENT_SUFFIX = {"gzip": ".warc.gz", "none": ".warc"}
+
+def warc_record(url, body, content_type="text/html"):
+    """(WARC 'resource' record for body, offset of body within it)."""
+    header = (f"WARC/1.0\r\n"
+              f"WARC-Type: resource\r\n"
+              f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+              f"WARC-Date: {time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())}\r\n"
+              f"WARC-Target-URI: {url}\r\n"
+              f"Content-Type: {content_type}\r\n"
+              f"Content-Length: {len(body)}\r\n\r\n").encode("utf-8")
+    return header + body + b"\r\n\r\n", len(header)
+
+class PageArchive:
+    """Appends fetched pages to segment files under folder, indexed by URL in index.db.
+
+    Each page is one WARC resource record, gzip-compressed as its own
+    member (or stored as is with compression="none"), so the segments are
+    ordinary .warc.gz / .warc files and any page can be read back by
+    seeking to its offset. A new segment is started by every run and
+    whenever the current one passes segment_size bytes. The index keeps
+    the latest copy of each URL. Thread-safe.
+    """
+
+    def __init__(self, folder=ARCHIVE_DIR, compression=ARCHIVE_COMPRESSION, segment_size=ARCHIVE_SEGMENT_SIZE):
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown archive compression {compression!r} (pick one of {', '.join(COMPRESSIONS)})")
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.compression = compression
+        self.segment_size = segment_size
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(folder, "index.db"), check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, segment TEXT, "
+                              "offset INTEGER, length INTEGER, body_offset INTEGER, body_length INTEGER, "
+                              "archived_at REAL)")
+        self.segment = None  # (name, open file) being written, opened on the first add()
+        self.unsaved = 0
+        self.pages = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def _next_segment(self):
+        numbers = [int(match.group(1)) for match in map(re.compile(r"segment-(\d+)\.warc").match,
+                                                        os.listdir(self.folder)) if match]
+        name = f"segment-{max(numbers, default=0) + 1:05d}{SEGMENT_SUFFIX[self.compression]}"
+        return name, open(os.path.join(self.folder, name), 'ab')
+
+    def _flush(self):
+        # Rows only point at records that are on disk
+        if self.segment:
+            self.segment[1].flush()
+        self.conn.commit()
+        self.unsaved = 0
+
+    def add(self, url, body, content_type="text/html"):
+        """Archives body as the latest copy of url."""
+        record, body_offset = warc_record(url, bytes(body), content_type)
+        stored = gzip.compress(record, compresslevel=6, mtime=0) if self.compression == "gzip" else record
+        with self.lock:
+            if self.segment is None or self.segment[1].tell() >= self.segment_size:
+                if self.segment:
+                    self._flush()
+                    self.segment[1].close()
+                self.segment = self._next_segment()
+            name, handle = self.segment
+            offset = handle.tell()
+            handle.write(stored)
+            self.conn.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                              (url, name, offset, len(stored), body_offset, len(body), time.time()))
+            self.unsaved += 1
+            if self.unsaved >= 100:
+                self._flush()
+            self.pages += 1
+            self.raw_bytes += len(body)
+            self.stored_bytes += len(stored)
+
+    def read(self, url):
+        """The latest archived body of url (None when it was never archived)."""
+        with self.lock:
+            self._flush()
+            row = self.conn.execute("SELECT segment, offset, length, body_offset, body_length FROM pages "
+                                    "WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        name, offset, length, body_offset, body_length = row
+        with open(os.path.join(self.folder, name), 'rb') as handle:
+            handle.seek(offset)
+            return bytes(page_body(handle.read(length), name, body_offset, body_length))
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            if self.segment:
+                self.segment[1].close()
+                self.segment = None
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def report(self):
+        return (f"Archive: {self.pages} pages archived to {self.folder} "
+                f"({self.raw_bytes / 1024:.0f} KB stored as {self.stored_bytes / 1024:.0f} KB)")
+
+def page_body(record, segment, body_offset, body_length):
+    """The page inside a stored record, as a memoryview (decompressed first for .gz segments)."""
+    if segment.endswith(".gz"):
+        record = zlib.decompress(record, 31)
+    return memoryview(record)[body_offset:body_offset + body_length]
+
+class ArchiveReader:
+    """Reads an --archive folder through memory maps, for batch re-extraction.
+
+    Each segment is mapped once instead of opened and read() per page.
+    Pages come back as memoryviews: for plain .warc segments a slice of
+    the map itself, so nothing is copied before the parser decodes it; for
+    .warc.gz segments the gzip member is decompressed straight from the
+    map. A view stays valid while the reader is open.
+    """
+
+    def __init__(self, folder=ARCHIVE_DIR):
+        self.folder = folder
+        self.index = sqlite3.connect(os.path.join(folder, "index.db"), check_same_thread=False)
+        self.maps = {}  # segment name -> mmap
+        self.listing_order = False  # whether temp.listed has been filled
+
+    def _map(self, segment):
+        if segment not in self.maps:
+            with open(os.path.join(self.folder, segment), 'rb') as f:
+                self.maps[segment] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.maps[segment]
+
+    def page(self, segment, offset, length, body_offset, body_length):
+        """The page stored at one index location."""
+        # Not timed: a slice of a map takes about a microsecond, less than the timing itself
+        record = memoryview(self._map(segment))[offset:offset + length]
+        return page_body(record, segment, body_offset, body_length)
+
+    def locations(self, in_listing_order=False):
+        """Yields (url, segment, offset, length, body_offset, body_length) for the latest copy of
+        every page; the index is streamed, not loaded whole.
+
+        Pages come in the order they were archived, which is the order concurrent fetches
+        happened to finish in. With in_listing_order the books come in the order the archived
+        listing pages show them instead, as in the crawl's files (see order_by_listing), and
+        pages no listing shows come last, by URL.
+        """
+        if not in_listing_order:
+            yield from self.index.execute("SELECT url, segment, offset, length, body_offset, body_length "
+                                          "FROM pages ORDER BY segment, offset")
+            return
+        self.order_by_listing()
+        yield from self.index.execute(
+            "SELECT pages.url, segment, offset, length, body_offset, body_length FROM pages "
+            "LEFT JOIN temp.listed ON listed.url = pages.url "
+            "ORDER BY listed.chain IS NULL, listed.chain, listed.page, listed.position, pages.url")
+
+    def order_by_listing(self):
+        """Records where each book is on the archived listing pages, for locations(in_listing_order=True).
+
+        Listing pages are chained by their 'next' links; a book's place is its
+        chain (chains ordered by the URL of their first page), the page in the
+        chain and the card on the page. A book on two chains (a category and
+        the site-wide listing) keeps its first place.
+        """
+        if self.listing_order:
+            return
+        from .crawl import read_listing_page
+        listings = {}  # listing page URL -> (book URLs, next page URL)
+        for url, page in self:
+            if LISTING_PAGE.search(page) is not None:
+                articles, next_url = read_listing_page(bytes(page), url)
+                listings[url] = ([urllib.parse.urljoin(url, article.find("h3").a["href"]) for article in articles],
+                                 next_url)
+        with self.index:
+            self.index.execute("CREATE TEMP TABLE listed (url TEXT PRIMARY KEY, chain INTEGER, page INTEGER, "
+                               "position INTEGER)")
+            linked = {next_url for _, next_url in listings.values()}
+            for chain, url in enumerate(sorted(set(listings) - linked)):
+                number = 0
+                while url in listings:
+                    book_urls, next_url = listings.pop(url)  # popped, so a loop of 'next' links ends
+                    self.index.executemany("INSERT OR IGNORE INTO temp.listed VALUES (?, ?, ?, ?)",
+                                           ((book_url, chain, number, position)
+                                            for position, book_url in enumerate(book_urls)))
+                    url, number = next_url, number + 1
+        self.listing_order = True
+
+    def read(self, url):
+        """The latest archived page of url (None when it was never archived)."""
+        row = self.index.execute("SELECT segment, offset, length, body_offset, body_length FROM pages "
+                                 "WHERE url = ?", (url,)).fetchone()
+        return self.page(*row) if row else None
+
+    def __iter__(self):
+        """Yields (url, page memoryview) for every page, in the order they were archived."""
+        for url, *location in self.locations():
+            yield url, self.page(*location)
+
+    def close(self):
+        self.index.close()
+        for segment in list(self.maps):
+            try:
+                self.maps.pop(segment).close()
+            except BufferError:
+                pass  # a page is still in use; the map closes when its last view goes
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+_worker_readers = {}  # folder -> ArchiveReader, one per parsing process
+
+def extract_archived(parser, folder, locations):
+    """Runs in a worker process: extracts the product pages among index locations.
+
+    The worker maps the archive itself, so only the locations are sent to
+    it and the Books sent back. Returns (url, Book, error, seconds) tuples.
+    """
+    from .extract import PARSERS, is_product_page
+    if folder not in _worker_readers:
+        _worker_readers[folder] = ArchiveReader(folder)
+    reader = _worker_readers[folder]
+    extract = PARSERS[parser]
+    results = []
+    for url, *location in locations:
+        page = reader.page(*location)
+        if not is_product_page(page):
+            continue
+        started = time.perf_counter()
+        try:
+            results.append((url, extract(page, url), None, time.perf_counter() - started))
+        except Exception as e:
+            results.append((url, None, f"{type(e).__name__}: {e}", time.perf_counter() - started))
+    return results
+
+def batches(items, size):
+    """Yields lists of up to size items."""
+    items = iter(items)
+    while True:
+        batch = list(itertools.islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+def reextract(reader, parser=DEFAULT_PARSER, processes=0, batch_size=PARSE_BATCH_SIZE * 16):
+    """Yields a Book for every product page of an ArchiveReader, extracted again; nothing is fetched.
+
+    The books come in the order the archived listing pages show them, so
+    the rows are the same, in the same order, as the crawl that archived
+    them wrote. With processes the pages are extracted in that many worker
+    processes, batch_size pages at a time. Pages that fail to extract are
+    reported and skipped, as in a crawl.
+    """
+    from .crawl import map_in_order
+    from .extract import PARSERS, is_product_page
+
+    if not processes:
+        extract = PARSERS[parser]
+        for url, *location in reader.locations(in_listing_order=True):
+            page = reader.page(*location)
+            if not is_product_page(page):
+                continue
+            METRICS.count("product_pages")
+            try:
+                yield extract(page, url)
+            except Exception as e:
+                print(f"Error re-extracting {url}: {e}")
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    from functools import partial
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        # Two batches per process in flight keeps them busy without reading the whole index ahead
+        done = map_in_order(pool, partial(extract_archived, parser, reader.folder),
+                            batches(reader.locations(in_listing_order=True), batch_size), processes * 2)
+        for results in done:
+            for url, book, error, seconds in results:
+                METRICS.record("parse", seconds)
+                METRICS.count("product_pages")
+                if error:
+                    print(f"Error re-extracting {url}: {error}")
+                else:
+                    yield book
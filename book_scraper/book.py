@@ -0,0 +1,102 @@
+"""The Book record every stage passes around, with typed prices, stock and rating."""
+import re
+import sys
+from collections import namedtuple
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+# Column order of the CSVs, as the original write_to_csv wrote them
+BOOK_FIELDS = [
+    "product_page_url", "universal_product_code", "title", "price_including_tax",
+    "price_excluding_tax", "number_available", "product_description", "category",
+    "review_rating", "image_url",
+]
+
+# Ratings as the site writes them, worst to best; records store 1-5
+RATINGS = ["One", "Two", "Three", "Four", "Five"]
+
+# Prices repeat across a catalogue, so books with the same price share one Decimal
+@lru_cache(maxsize=8192)
+def parse_price(text):
+    """'£51.77' -> Decimal('51.77') (None when there is no price)."""
+    if not text:
+        return None
+    try:
+        return Decimal(re.sub(r"[^\d.]", "", text))
+    except InvalidOperation:
+        return None
+
+def parse_stock(text):
+    """'In stock (19 available)' -> 19, 'Out of stock' -> 0, plain 'In stock' -> None."""
+    if not text:
+        return None
+    match = re.search(r"\((\d+) available\)", text)
+    if match:
+        return int(match.group(1))
+    return 0 if "out of stock" in text.lower() else None
+
+def parse_rating(text):
+    """'Three' -> 3 (None when the book has no rating)."""
+    return RATINGS.index(text) + 1 if text in RATINGS else None
+
+def format_price(price):
+    return f"£{price}" if price is not None else None
+
+def format_stock(count):
+    """The inverse of parse_stock; an unknown count (listing cards) reads 'In stock'."""
+    if count is None:
+        return "In stock"
+    return f"In stock ({count} available)" if count else "Out of stock"
+
+def format_rating(rating):
+    return RATINGS[rating - 1] if rating else ""
+
+# Typed field -> how the site writes it
+FORMATTERS = {
+    "price_including_tax": format_price,
+    "price_excluding_tax": format_price,
+    "number_available": format_stock,
+    "review_rating": format_rating,
+}
+
+@lru_cache(maxsize=None)
+def _text_getter(fields):
+    columns = [(BOOK_FIELDS.index(field), FORMATTERS.get(field)) for field in fields]
+    return lambda book: [convert(book[index]) if convert else book[index] for index, convert in columns]
+
+def text_getter(fields=BOOK_FIELDS):
+    """A function Book -> text values of fields, worked out once for a sink's whole run."""
+    return _text_getter(tuple(fields))
+
+class Book(namedtuple("Book", BOOK_FIELDS)):
+    """One scraped book: a tuple, so no per-record dict or repeated keys.
+
+    Prices are Decimal, number_available an int (None when the page only
+    says 'In stock'), review_rating 1-5 and category an interned string
+    shared by every book of the category. Fields a listing card does not
+    have are None. text() gives the record back as the site's text, which
+    is what the CSVs, the crawl state and the delta files store.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, product_page_url, universal_product_code, title, price_including_tax,
+              price_excluding_tax, number_available, product_description, category,
+              review_rating, image_url):
+        """A Book from the text found on the page, in BOOK_FIELDS order."""
+        return cls(product_page_url, universal_product_code, title, parse_price(price_including_tax),
+                   parse_price(price_excluding_tax), parse_stock(number_available), product_description,
+                   sys.intern(category) if category else category, parse_rating(review_rating), image_url)
+
+    @classmethod
+    def from_text(cls, record):
+        """A Book from a text record such as text() returns (missing fields are None)."""
+        return cls.parse(*(record.get(field) for field in BOOK_FIELDS))
+
+    def text_values(self, fields=BOOK_FIELDS):
+        """The chosen fields as the site writes them, in the order asked."""
+        return text_getter(fields)(self)
+
+    def text(self, fields=BOOK_FIELDS):
+        """The record as a {field: text} dict, like the scraper's original rows."""
+        return dict(zip(fields, self.text_values(fields)))
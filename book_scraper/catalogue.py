@@ -0,0 +1,145 @@
+"""The book catalogue as a SQLite database, updated in place on every crawl."""
+import os
+import sqlite3
+import threading
+import time
+
+from .book import BOOK_FIELDS
+from .config import CATALOGUE_PATH
+from .metrics import METRICS
+
+def to_pence(price):
+    return int(price * 100) if price is not None else None
+
+# Book field -> catalogue column, and the conversion applied on the way in (if any)
+COLUMNS = {
+    "universal_product_code": ("upc", None),
+    "product_page_url": ("product_page_url", None),
+    "title": ("title", None),
+    "category": ("category", None),
+    "price_including_tax": ("price_pence", to_pence),
+    "price_excluding_tax": ("price_excl_tax_pence", to_pence),
+    "number_available": ("number_available", None),
+    "review_rating": ("rating", None),
+    "product_description": ("product_description", None),
+    "image_url": ("image_url", None),
+}
+
+class Catalogue:
+    """Every book ever scraped, one row per UPC, plus a price history.
+
+    Rows are upserted: a re-crawl updates the books it sees and leaves the
+    rest alone. Columns left out of fields (--fields) keep their stored
+    value. A price_history row is added only when a book is new or
+    its price changed, so the history stays small.
+    """
+
+    def __init__(self, path=CATALOGUE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.upserts = 0
+        self.price_changes = 0
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS books (
+                upc TEXT PRIMARY KEY,
+                product_page_url TEXT,
+                title TEXT,
+                category TEXT,
+                price_pence INTEGER,
+                price_excl_tax_pence INTEGER,
+                number_available INTEGER,
+                rating INTEGER,
+                product_description TEXT,
+                image_url TEXT,
+                first_seen REAL,
+                last_seen REAL)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS books_category ON books (category)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS books_price ON books (price_pence)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS books_rating ON books (rating)")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS price_history (
+                upc TEXT,
+                price_pence INTEGER,
+                seen_at REAL,
+                PRIMARY KEY (upc, seen_at))""")
+
+    def write(self, books, fields=None):
+        """Upserts a batch of Books in one transaction."""
+        if not books:
+            return
+        now = time.time()
+        fields = set(fields or BOOK_FIELDS)
+        records = []
+        for book in books:
+            record = {column: convert(getattr(book, field)) if convert else getattr(book, field)
+                      for field, (column, convert) in COLUMNS.items() if field in fields}
+            if record.get("upc"):
+                records.append(record)
+        columns = [column for column, _ in COLUMNS.values()]
+        values = [tuple(record.get(column) for column in columns) + (now, now) for record in records]
+        updates = ", ".join(f"{column} = COALESCE(excluded.{column}, books.{column})"
+                            for column in columns[1:])
+        with self.lock, self.conn:
+            # Record a price before the upsert overwrites it, if it is new or different
+            changed = self.conn.executemany(
+                "INSERT OR IGNORE INTO price_history (upc, price_pence, seen_at) "
+                "SELECT ?, ?, ? WHERE ? IS NOT NULL AND NOT EXISTS "
+                "(SELECT 1 FROM books WHERE upc = ? AND price_pence IS ?)",
+                [(r["upc"], r.get("price_pence"), now, r.get("price_pence"), r["upc"], r.get("price_pence"))
+                 for r in records]).rowcount
+            self.conn.executemany(
+                f"INSERT INTO books ({', '.join(columns)}, first_seen, last_seen) "
+                f"VALUES ({', '.join('?' * (len(columns) + 2))}) "
+                f"ON CONFLICT (upc) DO UPDATE SET {updates}, last_seen = excluded.last_seen",
+                values)
+            self.upserts += len(records)
+            self.price_changes += max(changed, 0)
+
+    def sink(self, fields=None, batch_size=200):
+        return CatalogueSink(self, fields, batch_size)
+
+    def report(self):
+        with self.lock:
+            total = self.conn.execute("SELECT COUNT(*) FROM books").fetchone()[0]
+        return (f"Catalogue: {self.upserts} books upserted, {total} in total, "
+                f"{self.price_changes} new prices recorded")
+
+    def close(self):
+        self.conn.close()
+
+class CatalogueSink:
+    """Collects one category's Books and upserts them into the Catalogue in batches."""
+
+    def __init__(self, catalogue, fields=None, batch_size=200):
+        self.catalogue = catalogue
+        self.fields = fields
+        self.batch_size = batch_size
+        self.rows = 0
+        self.first_row_at = None
+        self.batch = []
+
+    def write(self, book):
+        with METRICS.time("write"):
+            if self.first_row_at is None:
+                self.first_row_at = time.perf_counter()
+            self.batch.append(book)
+            self.rows += 1
+            if len(self.batch) >= self.batch_size:
+                self.flush()
+        METRICS.count("rows_written")
+
+    def flush(self):
+        self.catalogue.write(self.batch, self.fields)
+        self.batch = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Rows already scraped are worth keeping even if the crawl failed
+        self.close()
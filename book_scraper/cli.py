@@ -0,0 +1,500 @@
+"""Command line entry point: `python -m book_scraper <mode> [options]`.
+
+Modes:
+    page URL        scrape one product page into a one-row CSV
+    category NAME   scrape one or more categories (CSV rows and cover images)
+    site            scrape every category (the default)
+    images          download every cover image without writing CSVs
+    reextract       re-run extraction over the pages saved by --archive (no network)
+
+Modules are imported inside the mode that needs them, so `--help` or a
+single page never loads the crawler, the SQLite state or BeautifulSoup.
+"""
+import argparse
+import os
+import sys
+import time
+
+from . import config
+from .utils import parse_age
+
+COMMANDS = ("page", "category", "site", "images", "reextract")
+
+def print_stage_summary(summary):
+    """Prints one line per crawl stage: how often it ran, its latency percentiles and throughput."""
+    print("Stage            count    p50 ms    p95 ms    p99 ms     per sec")
+    for stage, values in summary["stages"].items():
+        print(f"{stage:<14}{values['count']:>8}{values['p50_ms']:>10.2f}{values['p95_ms']:>10.2f}"
+              f"{values['p99_ms']:>10.2f}{values['per_second']:>12.1f}")
+    counters = summary["counters"]
+    print(f"{counters.get('bytes_received', 0) / 1024:.0f} KB of pages received, "
+          f"{counters.get('bytes_from_cache', 0) / 1024:.0f} KB of pages reused from the cache, "
+          f"{counters.get('image_bytes', 0) / 1024:.0f} KB of images")
+
+def network_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--site-root",
+                        help="scrape a copy of the site at this URL instead of books.toscrape.com")
+    parser.add_argument("--pool-size", type=int, default=config.POOL_SIZE,
+                        help="keep-alive connections kept open per host")
+    parser.add_argument("--timeout", type=float, default=config.REQUEST_TIMEOUT,
+                        help="seconds to wait for a response")
+    parser.add_argument("--max-rate", type=float, default=config.MAX_RATE,
+                        help="most requests per second sent to one host (the rate adapts below this)")
+    parser.add_argument("--host-concurrency", type=int, default=config.HOST_CONCURRENCY,
+                        help="most requests in flight to one host")
+    parser.add_argument("--retries", type=int, default=config.MAX_RETRIES,
+                        help="retries for connection errors, timeouts and 429/5xx responses")
+    parser.add_argument("--parser", choices=config.PARSER_NAMES, default=config.DEFAULT_PARSER,
+                        help="product page extractor")
+    return parser
+
+def crawl_options():
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--workers", type=int, default=config.MAX_WORKERS,
+                        help="product pages fetched in parallel (1 = sequential)")
+    parser.add_argument("--category-workers", type=int, default=config.CATEGORY_WORKERS,
+                        help="categories crawled at the same time")
+    parser.add_argument("--cache-dir", default=config.CACHE_DIR,
+                        help="folder for the conditional-request HTTP cache")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always download full responses")
+    parser.add_argument("--state", default=config.STATE_PATH,
+                        help="SQLite file recording finished work so a rerun resumes")
+    parser.add_argument("--no-state", action="store_true",
+                        help="ignore the crawl state and fetch everything")
+    parser.add_argument("--image-workers", type=int, default=config.IMAGE_WORKERS,
+                        help="cover images downloaded in parallel (0 = download inside the page workers)")
+    parser.add_argument("--verify-images", action="store_true",
+                        help="re-hash stored images before trusting them")
+    parser.add_argument("--refresh-older-than", type=parse_age, metavar="AGE",
+                        help="re-fetch entries saved more than AGE ago (e.g. 3600, 30m, 12h, 7d)")
+    parser.add_argument("--metrics-json", default=config.METRICS_PATH,
+                        help="where the per-stage timings and counters are written at the end")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve live Prometheus metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--parse-processes", type=int, default=0, metavar="N",
+                        help="extract product pages in N worker processes (0 = in the fetch threads)")
+    parser.add_argument("--parse-batch", type=int, default=config.PARSE_BATCH_SIZE,
+                        help="pages shipped to a parsing process at a time")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="fetch everything on one asyncio event loop (needs aiohttp); "
+                             "--workers then sets the parsing threads")
+    parser.add_argument("--concurrency", type=int, default=config.ASYNC_CONCURRENCY,
+                        help="with --async, most requests in flight at once")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"cProfile the extraction step and save the stats to {config.PROFILE_PATH}")
+    parser.add_argument("--archive", nargs="?", const=config.ARCHIVE_DIR, metavar="DIR",
+                        help=f"keep every fetched page in WARC-style files under DIR (default {config.ARCHIVE_DIR}) "
+                             "for the reextract mode")
+    parser.add_argument("--archive-compression", choices=("gzip", "none"), default=config.ARCHIVE_COMPRESSION,
+                        help="how archived pages are stored")
+    return parser
+
+def output_options(fields_help="comma-separated output columns"):
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--fields", type=lambda text: [f.strip() for f in text.split(",") if f.strip()],
+                        help=fields_help)
+    parser.add_argument("--format", choices=("csv", "parquet", "arrow", "sqlite"), default="csv",
+                        help="output: CSV text, typed Parquet / Arrow IPC files (needs pyarrow), "
+                             "or upserts into the SQLite catalogue")
+    parser.add_argument("--catalogue", default=config.CATALOGUE_PATH,
+                        help="SQLite catalogue used by --format sqlite")
+    return parser
+
+def row_options():
+    parser = argparse.ArgumentParser(add_help=False, parents=[output_options(
+        "comma-separated output columns; if the listing pages have them all, product pages are not fetched")])
+    parser.add_argument("--listing-only", action="store_true",
+                        help="build rows from the category listing pages only (no product pages or images)")
+    parser.add_argument("--no-images", action="store_true",
+                        help="write the rows without downloading cover images")
+    parser.add_argument("--delta", action="store_true",
+                        help=f"write the new, changed and removed books since the last --delta run "
+                             f"to {config.DELTA_DIR}/")
+    parser.add_argument("--skip-unchanged", action="store_true",
+                        help="with --delta, reuse last run's data for books whose listing card is unchanged "
+                             "instead of fetching their product page")
+    return parser
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="book_scraper",
+                                     description="Scrape books and cover images from books.toscrape.com")
+    commands = parser.add_subparsers(dest="command", metavar="{" + ",".join(COMMANDS) + "}")
+    network, crawl, rows = network_options(), crawl_options(), row_options()
+
+    page = commands.add_parser("page", parents=[network], help="scrape a single product page")
+    page.add_argument("url", help="product page URL")
+    page.add_argument("--output", default=os.path.join(config.OUTPUT_DIR, "book_data.csv"),
+                      help="CSV file for the row")
+    page.add_argument("--image", action="store_true", help="also download the cover image")
+    page.add_argument("--metrics-json", default=config.METRICS_PATH,
+                      help="where the per-stage timings and counters are written at the end")
+
+    category = commands.add_parser("category", parents=[network, crawl, rows],
+                                   help="scrape the named categories")
+    category.add_argument("categories", nargs="+", metavar="NAME",
+                          help="category name as shown in the sidebar (e.g. 'Food and Drink') or its URL")
+
+    site = commands.add_parser("site", parents=[network, crawl, rows], help="scrape every category")
+
+    images = commands.add_parser("images", parents=[network, crawl],
+                                 help="download every cover image without writing CSVs")
+    for command in (site, images):
+        command.add_argument("--global-listing", action="store_true",
+                             help="find the books on the site-wide catalogue/page-N.html listing in one pass "
+                                  "instead of walking every category")
+        command.add_argument("--frontier-memory", type=int, default=config.FRONTIER_MEMORY, metavar="N",
+                             help="with --global-listing, URLs kept in memory before the queue and the set of "
+                                  f"seen URLs spill to {config.FRONTIER_PATH}")
+    category.set_defaults(global_listing=False)
+    images.add_argument("--category", dest="categories", action="append", metavar="NAME",
+                        help="only this category (repeatable)")
+
+    reextract = commands.add_parser("reextract", parents=[output_options()], help="re-run extraction over the archived pages, with no network")
+    reextract.add_argument("--archive", default=config.ARCHIVE_DIR, metavar="DIR",
+                           help="folder written by --archive")
+    reextract.add_argument("--parser", choices=config.PARSER_NAMES, default=config.DEFAULT_PARSER,
+                           help="product page extractor")
+    reextract.add_argument("--parse-processes", type=int, default=0, metavar="N",
+                           help="extract in N worker processes (0 = in this process)")
+    reextract.add_argument("--parse-batch", type=int, default=config.PARSE_BATCH_SIZE * 16,
+                           help="pages shipped to a parsing process at a time")
+    return parser
+
+def parse_args(argv=None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # No mode given (nothing, or only options) means the full crawl, as the old Phase 4 script did
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "site")
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "site_root", None):
+        config.set_site_root(args.site_root)
+    if args.command == "reextract":
+        args.listing_only = False
+    if args.command in ("category", "site", "reextract"):
+        from .extract import BOOK_FIELDS, LISTING_FIELDS
+        unknown = set(args.fields or []) - set(BOOK_FIELDS)
+        if unknown:
+            parser.error(f"unknown field(s): {', '.join(sorted(unknown))}")
+        # Only product pages have the other fields, so skip them when nobody asked for those
+        if args.command != "reextract" and args.fields and set(args.fields) <= LISTING_FIELDS:
+            args.listing_only = True
+        if args.format == "sqlite":
+            # The catalogue is keyed on the UPC, which only product pages have
+            if args.listing_only:
+                parser.error("--format sqlite needs product pages; drop --listing-only or pick more --fields")
+            if args.fields and "universal_product_code" not in args.fields:
+                parser.error("--format sqlite needs universal_product_code in --fields")
+        elif args.format != "csv":
+            from .sinks import import_pyarrow
+            try:
+                import_pyarrow()
+            except ImportError as e:
+                parser.error(str(e))
+    if args.command == "reextract":
+        return args
+    if args.command == "images":
+        args.fields, args.listing_only, args.no_images, args.format = None, False, False, None
+        args.delta = args.skip_unchanged = False
+    elif args.command == "site":
+        args.categories = None
+    if args.command != "page" and args.profile and args.parse_processes:
+        parser.error("--profile only sees this process; run it without --parse-processes")
+    if args.command != "page" and args.skip_unchanged:
+        args.delta = True
+    if args.command != "page" and args.global_listing:
+        # Only the product page says which category a book is in
+        if args.listing_only:
+            parser.error("--global-listing needs product pages; drop --listing-only or pick more --fields")
+        if args.skip_unchanged:
+            parser.error("--skip-unchanged compares category listing cards; run it without --global-listing")
+        if args.categories:
+            parser.error("--global-listing covers every category; drop it to pick categories with --category")
+    if args.command != "page" and args.use_async:
+        from .aio import import_aiohttp
+        try:
+            import_aiohttp()
+        except ImportError as e:
+            parser.error(str(e))
+        if args.delta:
+            parser.error("--delta and --skip-unchanged are not supported with --async")
+        # Async crawls always start from scratch
+        args.no_state = True
+    return args
+
+def select_categories(categories, wanted):
+    """Keeps the categories asked for by name (any case) or URL, in the order asked."""
+    if not wanted:
+        return categories
+    by_name = {name.lower(): name for name in categories}
+    by_url = {url: name for name, url in categories.items()}
+    selected = {}
+    for item in wanted:
+        name = by_name.get(item.strip().lower()) or by_url.get(item)
+        if name is None:
+            raise SystemExit(f"Unknown category {item!r}. Categories: {', '.join(categories)}")
+        selected[name] = categories[name]
+    return selected
+
+def make_session(args, cache=None, archive=None):
+    from .fetch import PooledSession, RequestScheduler
+    scheduler = RequestScheduler(args.max_rate, args.host_concurrency, args.retries)
+    connections = getattr(args, "workers", 1) + getattr(args, "image_workers", 0) \
+        + getattr(args, "category_workers", 0)
+    return PooledSession(max(args.pool_size, connections), args.timeout, cache, scheduler, archive)
+
+def page_row(book):
+    """Phase 1's book_data.csv row: its own column names and order, prices without the £ and the
+    quantity as a bare number, as the original Phase 1 script wrote them."""
+    from .book import format_rating, format_stock
+    count = book.number_available
+    return {
+        "product_page_url": book.product_page_url,
+        "universal_product_code (upc)": book.universal_product_code,
+        "book_title": book.title.strip(),
+        "price_including_tax": book.price_including_tax,
+        "price_excluding_tax": book.price_excluding_tax,
+        "quantity_available": count if count else format_stock(count),
+        "product_description": book.product_description.strip(),
+        "category": book.category,
+        "review_rating": format_rating(book.review_rating) or "N/A",
+        "image_url": book.image_url,
+    }
+
+def run_page(args):
+    import csv
+    from .crawl import get_book_data
+    from .metrics import METRICS
+    session = make_session(args)
+    METRICS.reset()
+    print(f"Scraping data from: {args.url}")
+    data = get_book_data(args.url, session, args.parser)
+    if data is None:
+        print("\nFailed to write data: No data was scraped.")
+        return 1
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    row = page_row(data)
+    with open(args.output, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(row))
+        writer.writeheader()
+        writer.writerow(row)
+    for field, value in row.items():
+        print(f"{field}: {value if len(str(value)) < 80 else str(value)[:77] + '...'}")
+    if args.image:
+        from .images import ImageStore, download_image
+        store = ImageStore(config.IMAGE_DIR)
+        try:
+            download_image(data.image_url, data.category, data.title,
+                           data.universal_product_code, session, store)
+        finally:
+            store.close()
+    print()
+    print_stage_summary(METRICS.summary())
+    METRICS.write_json(args.metrics_json)
+    print(f"\nSuccess! Data saved to '{args.output}'.")
+    return 0
+
+async def crawl_site_async(args, cache, executor, parser, images, catalogue, archive=None):
+    """The --async crawl: categories, listing pages, product pages and images on one event loop."""
+    from .aio import AsyncSession, crawl_async, get_categories_async
+    from .frontier import Frontier
+    async with AsyncSession(args.concurrency, args.max_rate, args.retries, args.timeout, cache,
+                            archive, args.host_concurrency) as session:
+        categories = select_categories(await get_categories_async(session, executor), args.categories)
+        print(f"Total categories found: {len(categories)}")
+        sinks, cancelled = await crawl_async(categories, session, executor, parser, images, args.fields,
+                                             args.listing_only, args.format, catalogue, args.global_listing,
+                                             args.concurrency,
+                                             Frontier(config.FRONTIER_PATH, args.frontier_memory)
+                                             if args.global_listing else None)
+    return session, categories, sinks, cancelled
+
+def run_crawl(args):
+    from concurrent.futures import ThreadPoolExecutor
+    from functools import partial
+    from .archive import PageArchive
+    from .crawl import crawl_catalogue, crawl_category, get_categories
+    from .extract import PARSERS
+    from .fetch import HttpCache
+    from .frontier import Frontier
+    from .images import ImagePipeline, ImageStore
+    from .metrics import METRICS, ExtractionProfiler
+    from .sinks import output_folder
+
+    download_images = not (args.listing_only or args.no_images)
+    cache = None if args.no_cache else HttpCache(args.cache_dir)
+    archive = PageArchive(args.archive, args.archive_compression) if args.archive else None
+    # The --async session can only be opened on its event loop
+    session = None if args.use_async else make_session(args, cache, archive)
+    METRICS.reset()
+    metrics_server = METRICS.serve(args.metrics_port) if args.metrics_port else None
+    profiler = None
+    if args.profile:
+        profiler = ExtractionProfiler()
+        original_parsers = dict(PARSERS)
+        PARSERS.update({name: profiler.wrap(fn) for name, fn in original_parsers.items()})
+    parse_pool = None
+    if args.parse_processes > 0:
+        from .extract import ParsePool
+        parse_pool = ParsePool(args.parse_processes, args.parser, args.parse_batch)
+    start = time.perf_counter()
+
+    catalogue = None
+    if args.format == "sqlite":
+        from .catalogue import Catalogue
+        catalogue = Catalogue(args.catalogue)
+    elif args.format:
+        os.makedirs(output_folder(args.format, args.listing_only), exist_ok=True)
+
+    tracker = None
+    if args.delta:
+        from .delta import ChangeTracker
+        tracker = ChangeTracker(config.CHANGES_PATH, config.DELTA_DIR)
+        # Resuming would reuse old product pages and hide their changes
+        args.no_state = True
+
+    state = None
+    if not args.no_state:
+        from .state import CrawlState
+        state = CrawlState(args.state, args.refresh_older_than)
+
+    images = None
+    if download_images:
+        # With --async the images are downloaded on the event loop; the pipeline keeps the store and counts
+        images = ImagePipeline(0 if args.use_async else args.image_workers, session,
+                               ImageStore(config.IMAGE_DIR, args.refresh_older_than), args.verify_images)
+
+    # One pool of product workers shared by every category (with --async it
+    # only parses); categories run on their own small pool so listing pages
+    # of several categories overlap
+    executor = ThreadPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    category_pool = None
+    cancelled = False
+    try:
+        if args.use_async:
+            import asyncio
+            session, categories, sinks, cancelled = asyncio.run(
+                crawl_site_async(args, cache, executor, parse_pool or args.parser, images, catalogue, archive))
+        else:
+            categories = select_categories(get_categories(session), args.categories)
+            print(f"Total categories found: {len(categories)}")
+            if args.global_listing:
+                sinks = crawl_catalogue(executor, session, parse_pool or args.parser, state, args.workers * 4,
+                                        images, args.fields, download_images, args.format, catalogue, tracker,
+                                        Frontier(config.FRONTIER_PATH, args.frontier_memory))
+            else:
+                category_pool = ThreadPoolExecutor(max_workers=max(args.category_workers, 1),
+                                                   thread_name_prefix="category")
+                crawl = partial(crawl_category, executor=executor, session=session,
+                                parser=parse_pool or args.parser, state=state, window=args.workers * 4,
+                                images=images, fields=args.fields, listing_only=args.listing_only,
+                                download_images=download_images, output_format=args.format,
+                                catalogue=catalogue, tracker=tracker, skip_unchanged=args.skip_unchanged)
+                sinks = list(category_pool.map(crawl, categories.keys(), categories.values()))
+        total_books = sum(sink.rows for sink in sinks)
+        if tracker:
+            tracker.finish(categories.keys())
+        if state:
+            state.finish(categories)
+        first_rows = [sink.first_row_at for sink in sinks if sink.first_row_at]
+    finally:
+        if category_pool:
+            category_pool.shutdown()
+        if executor:
+            executor.shutdown()
+        if parse_pool:
+            parse_pool.close()
+        if images:
+            images.close()
+        if state:
+            state.close()
+        if catalogue:
+            report = catalogue.report()
+            catalogue.close()
+        if tracker:
+            tracker.close()
+        if archive:
+            archive.close()
+        if profiler:
+            PARSERS.update(original_parsers)
+        if metrics_server:
+            metrics_server.shutdown()
+
+    elapsed = time.perf_counter() - start
+    mode = f"async, {args.concurrency} in flight at most" if args.use_async else f"{args.workers} workers"
+    print(f"\nScraped {total_books} books in {elapsed:.2f}s ({total_books / elapsed:.1f} pages/sec, {mode})")
+    if first_rows:
+        print(f"First row written after {min(first_rows) - start:.2f}s")
+    if args.use_async:
+        print(session.report())
+    else:
+        sent, opened = session.connection_stats()
+        print(f"{sent} requests over {opened} connections")
+        print(session.scheduler.report())
+    if images:
+        print(images.report())
+    if archive:
+        print(archive.report())
+    if cache:
+        print(f"HTTP cache: {cache.hits} hits, {cache.misses} misses, "
+              f"{cache.bytes_saved / 1024:.0f} KB not re-downloaded")
+    if catalogue:
+        print(report)
+    if tracker:
+        print(tracker.report())
+    print_stage_summary(METRICS.summary())
+    METRICS.write_json(args.metrics_json)
+    if profiler:
+        profiler.report(config.PROFILE_PATH)
+    if cancelled:
+        return 130
+    print("Success! Data saved to 'scraped_data' folder.")
+    return 0
+
+def run_reextract(args):
+    """Extracts every archived product page again and writes the rows; no request is sent."""
+    from .archive import ArchiveReader, reextract
+    from .crawl import write_by_category
+    from .metrics import METRICS
+    from .sinks import output_folder
+
+    if not os.path.exists(os.path.join(args.archive, "index.db")):
+        print(f"No archive in {args.archive}; crawl with --archive first.")
+        return 1
+    METRICS.reset()
+    catalogue = None
+    if args.format == "sqlite":
+        from .catalogue import Catalogue
+        catalogue = Catalogue(args.catalogue)
+    else:
+        os.makedirs(output_folder(args.format, False), exist_ok=True)
+    start = time.perf_counter()
+    with ArchiveReader(args.archive) as reader:
+        try:
+            books = reextract(reader, args.parser, args.parse_processes, args.parse_batch)
+            sinks = write_by_category(books, args.format, args.fields, catalogue)
+        finally:
+            if catalogue:
+                report = catalogue.report()
+                catalogue.close()
+    elapsed = time.perf_counter() - start
+    summary = METRICS.summary()
+    pages = summary["counters"].get("product_pages", 0)
+    total_books = sum(sink.rows for sink in sinks)
+    print(f"\nRe-extracted {total_books} books from {pages} archived product pages in {elapsed:.2f}s "
+          f"({pages / elapsed:.0f} pages/sec)")
+    if catalogue:
+        print(report)
+    print_stage_summary(summary)
+    print("Success! Data saved to 'scraped_data' folder.")
+    return 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "page":
+        return run_page(args)
+    if args.command == "reextract":
+        return run_reextract(args)
+    return run_crawl(args)
@@ -0,0 +1,85 @@
+"""Settings shared by every part of the scraper.
+
+Only the standard library is imported here, so the command line can read
+its defaults without loading requests or BeautifulSoup.
+"""
+import os
+import urllib.parse
+
+# Base URLs (set BOOKS_SITE_ROOT or pass --site-root to point at a local mirror)
+SITE_ROOT = os.environ.get("BOOKS_SITE_ROOT", "http://books.toscrape.com/")
+BASE_SITE_URL = urllib.parse.urljoin(SITE_ROOT, "index.html")
+CATALOGUE_PREFIX = urllib.parse.urljoin(SITE_ROOT, "catalogue/")
+
+def set_site_root(site_root):
+    """Points every URL the scraper builds at another copy of the site."""
+    global SITE_ROOT, BASE_SITE_URL, CATALOGUE_PREFIX
+    SITE_ROOT = site_root if site_root.endswith("/") else site_root + "/"
+    BASE_SITE_URL = urllib.parse.urljoin(SITE_ROOT, "index.html")
+    CATALOGUE_PREFIX = urllib.parse.urljoin(SITE_ROOT, "catalogue/")
+
+# Everything the scraper writes goes under here
+OUTPUT_DIR = "scraped_data"
+
+# How many product pages to fetch at the same time (1 = one after another)
+MAX_WORKERS = 8
+# How many categories have their listing pages walked at the same time
+CATEGORY_WORKERS = 4
+
+# Connection pool shared by every request (keep-alive instead of one connection per page)
+POOL_SIZE = 10
+REQUEST_TIMEOUT = 30  # seconds
+
+# Responses are kept here and revalidated with ETag / Last-Modified on the next crawl
+CACHE_DIR = "scraped_data/http_cache"
+
+# --async keeps up to this many requests in flight on one event loop
+ASYNC_CONCURRENCY = 1000
+
+# Politeness and retries, per host. The rate starts low and adapts between
+# MIN_RATE and MAX_RATE requests/second depending on latency and errors.
+MAX_RATE = 20.0
+MIN_RATE = 0.5
+HOST_CONCURRENCY = 16
+TARGET_LATENCY = 1.0  # seconds; slower responses make us back off
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5  # seconds, doubled on every retry
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Which extractor reads product pages: "fast" (single pass) or "bs4" (BeautifulSoup)
+PARSER_NAMES = ("bs4", "fast")
+DEFAULT_PARSER = "fast"
+# Pages sent to a parsing process at a time (--parse-processes)
+PARSE_BATCH_SIZE = 4
+
+# Cover images are downloaded by their own pool of workers, in chunks of this size
+IMAGE_WORKERS = 8
+IMAGE_CHUNK_SIZE = 64 * 1024
+IMAGE_DIR = "scraped_data/images"
+
+# --format sqlite keeps every book here, updated in place on each crawl
+CATALOGUE_PATH = "scraped_data/catalogue.db"
+
+# --delta keeps the hash of every book here and writes what changed to DELTA_DIR
+CHANGES_PATH = "scraped_data/changes.db"
+DELTA_DIR = "scraped_data/deltas"
+
+# --archive keeps every fetched page here as WARC-style segments ("gzip" or
+# "none" for uncompressed), each up to ARCHIVE_SEGMENT_SIZE bytes
+ARCHIVE_DIR = "scraped_data/archive"
+ARCHIVE_COMPRESSION = "gzip"
+ARCHIVE_SEGMENT_SIZE = 256 * 2**20
+
+# --global-listing queues the book URLs it finds here once more than
+# FRONTIER_MEMORY of them are waiting (or have been seen); deleted at the end
+FRONTIER_PATH = "scraped_data/frontier.db"
+FRONTIER_MEMORY = 100_000
+
+# Progress is saved here so an interrupted crawl can pick up where it stopped
+STATE_PATH = "scraped_data/crawl_state.db"
+
+# Timings per stage are kept in a fixed-size random sample, so memory stays flat
+METRICS_SAMPLE_SIZE = 10000
+METRICS_PATH = "scraped_data/metrics.json"
+PROFILE_PATH = "scraped_data/extract.prof"
@@ -0,0 +1,280 @@
+"""Walking the site: categories, listing pages and product pages, streamed into sinks."""
+import contextlib
+import urllib.parse
+from collections import deque
+from functools import partial
+
+from . import config
+from .config import MAX_WORKERS
+from .delta import record_hash
+from .extract import book_link, extract_page, parse_listing_card
+from .fetch import default_session
+from .frontier import Frontier
+from .images import download_image
+from .metrics import METRICS
+from .sinks import open_sink
+from .utils import slugify
+
+def get_categories(session=None):
+    session = session or default_session()
+    return parse_categories(session.get(config.BASE_SITE_URL).content)
+
+def parse_categories(content):
+    """{category name: listing URL} from the sidebar of the home page."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(content, "html.parser")
+    categories = {}
+    category_list = soup.find("div", class_="side_categories").ul.find("ul")
+    for link in category_list.find_all("a"):
+        cat_name = link.text.strip()
+        cat_url = urllib.parse.urljoin(config.BASE_SITE_URL, link['href'])
+        categories[cat_name] = cat_url
+    return categories
+
+def get_book_data(book_url, session=None, parser=None):
+    """Fetches one product page and extracts its Book (None on failure).
+
+    parser is a name from PARSERS or a callable such as a ParsePool.
+    """
+    session = session or default_session()
+    try:
+        response = session.get(book_url)
+        METRICS.count("product_pages")
+        return extract_page(response.content, book_url, parser)
+    except Exception as e:
+        print(f"Error scraping {book_url}: {e}")
+        return None
+
+def read_listing_page(content, page_url):
+    """Parses one listing page into (its article.product_pod cards, the next page's URL or None)."""
+    from bs4 import BeautifulSoup
+    with METRICS.time("parse_listing"):
+        soup = BeautifulSoup(content, "html.parser")
+    METRICS.count("listing_pages")
+    next_button = soup.find("li", class_="next")
+    next_url = urllib.parse.urljoin(page_url, next_button.a["href"]) if next_button else None
+    return soup.find_all("article", class_="product_pod"), next_url
+
+def iter_listing_pages(category_url, session=None):
+    """Yields (page url, cards) for each listing page of a category, following the 'next' links."""
+    session = session or default_session()
+    current_url = category_url
+    while current_url:
+        articles, next_url = read_listing_page(session.get(current_url).content, current_url)
+        yield current_url, articles
+        current_url = next_url
+
+def iter_category_books(category_url, session=None):
+    """Yields the book URLs of a category page by page.
+
+    Product pages can be fetched as soon as the first listing page has been
+    read, instead of waiting for the whole pagination.
+    """
+    for _, articles in iter_listing_pages(category_url, session):
+        for article in articles:
+            yield book_link(article)
+
+def iter_category_cards(category_url, category_name, session=None):
+    """Yields a partial book record for every book in a category, without
+    fetching any product page (one request per 20 books)."""
+    for page_url, articles in iter_listing_pages(category_url, session):
+        for article in articles:
+            yield parse_listing_card(article, page_url, category_name)
+
+def get_category_books(category_url, session=None):
+    return list(iter_category_books(category_url, session))
+
+def catalogue_url():
+    """First page of the site-wide listing of every book (catalogue/page-1.html)."""
+    return config.CATALOGUE_PREFIX + "page-1.html"
+
+def scrape_book(book_url, category_name, session=None, parser=None, state=None, images=None,
+                download_images=True):
+    """Scrapes one product page and downloads its cover image.
+
+    With an ImagePipeline the image is handed to it instead of being
+    downloaded by this worker; with download_images=False it is skipped.
+    Books already recorded in the crawl state are reused instead of fetched.
+    With no category_name the book goes under the category of its breadcrumb.
+    """
+    data = state.get_product(book_url) if state else None
+    if data is None:
+        data = get_book_data(book_url, session, parser)
+        if data and state:
+            state.save_product(book_url, category_name or data.category, data)
+        action = "Scraped"
+    else:
+        action = "Already done"
+    if data:
+        category_name = category_name or data.category
+        upc = data.universal_product_code
+        if download_images and images:
+            images.submit(data.image_url, category_name, data.title, upc)
+        elif download_images:
+            download_image(data.image_url, category_name, data.title, upc, session)
+        print(f"  > {action}: {data.title[:30]}...")
+    return data
+
+def map_in_order(executor, fn, items, window):
+    """Like executor.map, but yields results as they are ready with at most
+    `window` tasks in flight, so memory does not grow with the item count."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        # Hand over anything already finished without waiting for the window to fill
+        while pending and pending[0].done():
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def scrape_books(book_urls, category_name, executor=None, session=None, parser=None, state=None,
+                 window=MAX_WORKERS * 4, images=None, download_images=True):
+    """Yields every book in a category, scraped in parallel when an executor is given.
+
+    Results come back in the same order as book_urls, so the CSV rows stay
+    in listing order no matter which page finishes first. At most `window`
+    books are in flight or waiting to be written at any time.
+    """
+    work = partial(scrape_book, category_name=category_name, session=session, parser=parser,
+                   state=state, images=images, download_images=download_images)
+    if executor is None:
+        return (work(url) for url in book_urls)
+    return map_in_order(executor, work, book_urls, window)
+
+def discover_books(category_url, session=None, state=None):
+    """Book URLs for a category: the saved listing when there is one, otherwise
+    streamed from the listing pages and saved once the last page is read."""
+    book_urls = state.get_listing(category_url) if state else None
+    if book_urls is not None:
+        yield from book_urls
+        return
+    found = []
+    for url in iter_category_books(category_url, session):
+        found.append(url)
+        yield url
+    if state:
+        state.save_listing(category_url, found)
+
+def scrape_tracked_books(category_url, category_name, tracker, executor=None, session=None, parser=None,
+                         window=MAX_WORKERS * 4, images=None, download_images=True, skip_unchanged=False):
+    """Like scrape_books, but driven by the listing cards so each card can be hashed.
+
+    With skip_unchanged a book whose card (title, price, rating, stock,
+    thumbnail) hashes the same as last run is not fetched again; its stored
+    record is reused. A change that only shows on the product page (e.g.
+    the exact stock count) is then picked up on the next full crawl.
+    """
+    def work(card):
+        url = card.product_page_url
+        card_hash = record_hash(card.text())
+        tracker.note_card(url, card_hash)
+        if skip_unchanged:
+            previous = tracker.unchanged_record(url, card_hash)
+            if previous is not None:
+                METRICS.count("product_pages_skipped")
+                return previous
+        return scrape_book(url, category_name, session, parser, None, images, download_images)
+
+    cards = iter_category_cards(category_url, category_name, session)
+    if executor is None:
+        return (work(card) for card in cards)
+    return map_in_order(executor, work, cards, window)
+
+def crawl_category(cat_name, cat_url, executor=None, session=None, parser=None, state=None,
+                   window=MAX_WORKERS * 4, images=None, fields=None, listing_only=False,
+                   download_images=True, output_format="csv", catalogue=None, tracker=None,
+                   skip_unchanged=False):
+    """Listing pages -> product pages -> rows for one category, all streaming.
+
+    With listing_only the rows come straight from the listing cards and no
+    product page or image is fetched. fields limits (and orders) the columns.
+    output_format picks the file written ("csv", "parquet" or "arrow") or
+    "sqlite" to upsert into catalogue; with None the books are still scraped
+    (e.g. for their images) but nothing is written.
+    With a ChangeTracker every book is also compared with the previous run
+    (see scrape_tracked_books for skip_unchanged).
+    Returns the finished sink (row count and when the first row was written).
+    """
+    print(f"\n--- Processing: {cat_name} ---")
+    if listing_only:
+        rows = iter_category_cards(cat_url, cat_name, session)
+    elif tracker:
+        rows = scrape_tracked_books(cat_url, cat_name, tracker, executor, session, parser, window, images,
+                                    download_images, skip_unchanged)
+    else:
+        book_urls = discover_books(cat_url, session, state)
+        rows = scrape_books(book_urls, cat_name, executor, session, parser, state, window, images,
+                            download_images)
+
+    # Each row is written as soon as its book is scraped
+    with open_sink(output_format, slugify(cat_name), listing_only, catalogue, fields) as sink:
+        for data in rows:
+            if data:
+                if tracker:
+                    tracker.observe(data, cat_name)
+                sink.write(data)
+    return sink
+
+def crawl_catalogue(executor=None, session=None, parser=None, state=None, window=MAX_WORKERS * 4, images=None,
+                    fields=None, download_images=True, output_format="csv", catalogue=None, tracker=None,
+                    frontier=None):
+    """Every book on the site from the one site-wide listing, instead of category by category.
+
+    The catalogue/page-N.html pages are walked once by a discovery thread
+    that pushes every book URL into a Frontier (a new one unless given),
+    which drops repeats and spills to disk past its memory budget, while
+    the product pages are fetched from it; so memory stays bounded however
+    many books the site has. Each book's row goes to the file of the
+    category named in its breadcrumb, so the per-category files and image
+    folders are the same as a category crawl (rows follow the site-wide
+    listing's order). Finished product pages are skipped through the crawl
+    state, but the listing itself is not saved (it could be millions of URLs).
+    Returns the finished sinks, one per category.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    print("\n--- Processing: every book, from the site-wide listing ---")
+    if frontier is None:
+        frontier = Frontier()
+
+    def discover():
+        try:
+            for url in iter_category_books(catalogue_url(), session):
+                if frontier.finished:
+                    break  # the crawl stopped
+                if tracker:
+                    tracker.note_listed(url)
+                frontier.push(url)
+        finally:
+            frontier.finish()
+
+    with frontier, ThreadPoolExecutor(max_workers=1, thread_name_prefix="discovery") as discovery:
+        found = discovery.submit(discover)
+        try:
+            rows = scrape_books(frontier.drain(), None, executor, session, parser, state, window, images,
+                                download_images)
+            sinks = write_by_category(rows, output_format, fields, catalogue, tracker)
+        finally:
+            frontier.finish()
+        found.result()  # a listing page that failed fails the crawl, as in a category crawl
+    print(frontier.report())
+    return sinks
+
+def write_by_category(books, output_format="csv", fields=None, catalogue=None, tracker=None):
+    """Writes each Book to the sink of the category in its breadcrumb, opened as its first book arrives.
+
+    None entries (failed pages) are skipped. Returns the finished sinks.
+    """
+    sinks = {}
+    with contextlib.ExitStack() as stack:
+        for data in books:
+            if data:
+                if data.category not in sinks:
+                    sinks[data.category] = stack.enter_context(
+                        open_sink(output_format, slugify(data.category), False, catalogue, fields))
+                if tracker:
+                    tracker.observe(data, data.category)
+                sinks[data.category].write(data)
+    return list(sinks.values())
@@ -0,0 +1,105 @@
+"""Change detection between crawls: only new, changed and removed books are reported."""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .book import Book
+from .config import CHANGES_PATH, DELTA_DIR
+
+def normalize(record):
+    """The record with whitespace runs collapsed, so layout changes are not data changes."""
+    return {field: " ".join(value.split()) if isinstance(value, str) else value
+            for field, value in record.items()}
+
+def record_hash(record):
+    """The hash of a text record (see Book.text), so it does not change with the record type."""
+    text = json.dumps(normalize(record), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class ChangeTracker:
+    """Compares every book of this crawl with the previous one.
+
+    The hash and data of each book are kept in SQLite between runs. New and
+    changed books are appended to a delta file (JSON lines) as they are seen;
+    books of the crawled categories that are no longer listed are written as
+    removed by finish(). A book still listed whose product page failed this
+    time keeps its stored row, so one failed fetch is not reported as a
+    removal. The hash of each book's listing card is kept too, so a crawl
+    can skip product pages whose card has not changed.
+    """
+
+    def __init__(self, path=CHANGES_PATH, delta_dir=DELTA_DIR):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        os.makedirs(delta_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.run_id = time.time()
+        self.cards = {}  # url -> listing card hash seen in this run
+        self.counts = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0}
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS books (url TEXT PRIMARY KEY, category TEXT, "
+                              "record_hash TEXT, card_hash TEXT, data TEXT, run_id REAL)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS books_category ON books (category)")
+            # Every URL the listings of this run showed, kept on disk rather than in a set
+            self.conn.execute("CREATE TEMP TABLE listed (url TEXT PRIMARY KEY)")
+        self.delta_path = os.path.join(delta_dir, time.strftime("delta-%Y%m%d-%H%M%S.jsonl"))
+        self.delta = open(self.delta_path + ".part", 'w', encoding='utf-8')
+
+    def _emit(self, change, category, data):
+        self.counts[change] += 1
+        if change != "unchanged":
+            self.delta.write(json.dumps({"change": change, "category": category, "record": data},
+                                        ensure_ascii=False) + "\n")
+
+    def note_listed(self, url):
+        """Remembers that a listing of this run shows the book at url."""
+        with self.lock:
+            self.conn.execute("INSERT OR IGNORE INTO listed VALUES (?)", (url,))
+
+    def note_card(self, url, card_hash):
+        """Remembers the listing card hash of a book seen in this run."""
+        with self.lock:
+            self.cards[url] = card_hash
+            self.conn.execute("INSERT OR IGNORE INTO listed VALUES (?)", (url,))
+
+    def unchanged_record(self, url, card_hash):
+        """The previous Book of a book whose listing card is unchanged, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT data FROM books WHERE url = ? AND card_hash = ?",
+                                    (url, card_hash)).fetchone()
+        return Book.from_text(json.loads(row[0])) if row else None
+
+    def observe(self, book, category):
+        """Classifies one scraped Book as new, changed or unchanged and records it."""
+        url = book.product_page_url
+        data = book.text()
+        digest = record_hash(data)
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT record_hash, card_hash FROM books WHERE url = ?", (url,)).fetchone()
+            card_hash = self.cards.pop(url, row[1] if row else None)
+            self.conn.execute("INSERT OR REPLACE INTO books VALUES (?, ?, ?, ?, ?, ?)",
+                              (url, category, digest, card_hash, json.dumps(data), self.run_id))
+            self._emit("new" if row is None else "changed" if row[0] != digest else "unchanged", category, data)
+
+    def finish(self, categories):
+        """Reports books of the crawled categories that no listing of this run showed, then forgets them."""
+        gone_from = "FROM books WHERE category = ? AND run_id != ? AND url NOT IN (SELECT url FROM listed)"
+        with self.lock, self.conn:
+            for category in categories:
+                for (data,) in self.conn.execute(f"SELECT data {gone_from}", (category, self.run_id)).fetchall():
+                    self._emit("removed", category, json.loads(data))
+                self.conn.execute(f"DELETE {gone_from}", (category, self.run_id))
+
+    def report(self):
+        counts = self.counts
+        return (f"Changes: {counts['new']} new, {counts['changed']} changed, {counts['removed']} removed, "
+                f"{counts['unchanged']} unchanged -> {self.delta_path}")
+
+    def close(self):
+        self.delta.close()
+        os.replace(self.delta_path + ".part", self.delta_path)
+        self.conn.close()
@@ -0,0 +1,216 @@
+"""Turning product pages and listing cards into book records."""
+import re
+import threading
+import time
+import urllib.parse
+
+from . import config
+from .book import BOOK_FIELDS, Book
+from .metrics import METRICS
+from .plans import Attr, ExtractionPlan, Field, Row, Tag, Text
+
+# Fields a listing card has in full; a card's stock is only "In stock", so number_available
+# (the exact count) still comes from the product page unless --listing-only is asked for
+LISTING_FIELDS = {"product_page_url", "title", "price_including_tax", "category", "review_rating"}
+
+def extract_book_data(html, book_url):
+    """Pulls the book fields out of a product page with BeautifulSoup."""
+    from bs4 import BeautifulSoup
+    if isinstance(html, memoryview):
+        html = bytes(html)  # BeautifulSoup only takes str or bytes
+    with METRICS.time("parse"):
+        soup = BeautifulSoup(html, "html.parser")
+    with METRICS.time("extract"):
+        return _extract_from_soup(soup, book_url)
+
+def _extract_from_soup(soup, book_url):
+    info_table = {row.th.text: row.td.text for row in soup.find_all("tr")}
+    desc_tag = soup.find("div", id="product_description")
+    description = desc_tag.find_next("p").text if desc_tag else ""
+    rating_tag = soup.find("p", class_="star-rating")
+    rating = rating_tag['class'][1] if rating_tag else ""
+
+    # Image Handling
+    img_tag = soup.find("img")
+    img_rel_url = img_tag['src']
+    image_url = urllib.parse.urljoin(book_url, img_rel_url)
+
+    return Book.parse(
+        product_page_url=book_url,
+        universal_product_code=info_table.get("UPC"),
+        title=soup.find("h1").text,
+        price_including_tax=info_table.get("Price (incl. tax)"),
+        price_excluding_tax=info_table.get("Price (excl. tax)"),
+        number_available=info_table.get("Availability"),
+        product_description=description,
+        category=soup.find("ul", class_="breadcrumb").find_all("li")[2].text.strip(),
+        review_rating=rating,
+        image_url=image_url
+    )
+
+# Where extract_book_data_fast finds each field of a product page; the same
+# lookups as extract_book_data, compiled into one pass (see plans.py)
+PRODUCT_PAGE_FIELDS = {
+    "universal_product_code": Field(Row("UPC")),
+    "title": Field(Text("h1"), required=True),
+    "price_including_tax": Field(Row("Price (incl. tax)")),
+    "price_excluding_tax": Field(Row("Price (excl. tax)")),
+    "number_available": Field(Row("Availability")),
+    "product_description": Field(Text("p", after=Tag("div", id="product_description")), default=""),
+    "category": Field(Text("li", within=Tag("ul", class_="breadcrumb"), index=2), clean=str.strip, required=True),
+    "review_rating": Field(Attr("p", "class", class_="star-rating"), clean=lambda classes: classes.split()[1],
+                           default=""),
+    "image_url": Field(Attr("img", "src"), url=True, required=True),
+}
+# Everything is above the end of the product table, so the scan stops there
+PRODUCT_PAGE = ExtractionPlan(PRODUCT_PAGE_FIELDS, stop_after="table")
+
+def extract_book_data_fast(html, book_url):
+    """Same result as extract_book_data, from one compiled pass over the page instead of a tree."""
+    if not isinstance(html, str):
+        # str() decodes any buffer (bytes, or a memoryview into an archive) without copying it first
+        try:
+            html = str(html, "utf-8")
+        except UnicodeDecodeError:
+            html = str(html, "windows-1252", errors="replace")
+    with METRICS.time("parse"):
+        found = PRODUCT_PAGE.scan(html)
+    with METRICS.time("extract"):
+        return Book.parse(product_page_url=book_url, **PRODUCT_PAGE.clean(found, book_url))
+
+PRODUCT_PAGE_MARKER = re.compile(rb'class="product_page"')
+
+def is_product_page(html):
+    """True for a product page; listing and home pages have no article.product_page.
+
+    html can be bytes or a memoryview, which is searched in place.
+    """
+    return PRODUCT_PAGE_MARKER.search(html) is not None
+
+PARSERS = {
+    "bs4": extract_book_data,
+    "fast": extract_book_data_fast,
+}
+
+def extract_page(content, book_url, parser=None):
+    """get_book_data for a page already in hand: content is bytes, a memoryview or str.
+
+    parser is a name from PARSERS or a callable such as a ParsePool.
+    """
+    extract = parser if callable(parser) else PARSERS[parser or config.DEFAULT_PARSER]
+    return extract(content, book_url)
+
+def extract_batch(parser, pages):
+    """Runs in a worker process: extracts a batch of (html, url) pages.
+
+    Each result is a (Book, error, seconds) tuple; a Book pickles as a
+    plain tuple, so little has to be sent back to the crawler.
+    """
+    extract = PARSERS[parser]
+    results = []
+    for html, url in pages:
+        started = time.perf_counter()
+        try:
+            results.append((extract(html, url), None, time.perf_counter() - started))
+        except Exception as e:
+            results.append((None, f"{type(e).__name__}: {e}", time.perf_counter() - started))
+    return results
+
+class ParsePool:
+    """Extracts product pages in a pool of processes so parsing is not held to one core by the GIL.
+
+    Fetch threads call the pool like an extractor: pool(html, url). Pages
+    are queued and shipped to the processes in batches of batch_size; a
+    thread whose page has waited max_delay seconds sends the partial batch
+    itself, so a lone page is never stuck waiting for company.
+    """
+
+    def __init__(self, processes, parser=None, batch_size=4, max_delay=0.005):
+        from concurrent.futures import ProcessPoolExecutor
+        self.executor = ProcessPoolExecutor(max_workers=processes)
+        self.parser = parser or config.DEFAULT_PARSER
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.pending = []  # (html, url, Future) not yet sent to a process
+
+    def __call__(self, html, book_url):
+        from concurrent.futures import Future, TimeoutError
+        future = Future()
+        with self.lock:
+            self.pending.append((html, book_url, future))
+            batch = self._take() if len(self.pending) >= self.batch_size else None
+        if batch:
+            self._submit(batch)
+        try:
+            return self._record(future.result(timeout=self.max_delay))
+        except TimeoutError:
+            pass
+        with self.lock:
+            batch = self._take() if any(item[2] is future for item in self.pending) else None
+        if batch:
+            self._submit(batch)
+        return self._record(future.result())
+
+    def _take(self):
+        batch, self.pending = self.pending, []
+        return batch
+
+    def _submit(self, batch):
+        try:
+            done = self.executor.submit(extract_batch, self.parser, [(html, url) for html, url, _ in batch])
+        except Exception as e:
+            # e.g. BrokenProcessPool after a worker died: every page of the batch fails, not only
+            # the caller's, so no other thread is left waiting on its page
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        done.add_done_callback(lambda done: self._deliver(batch, done))
+
+    def _deliver(self, batch, done):
+        error = done.exception()
+        for index, (_, _, future) in enumerate(batch):
+            if error:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[index])
+
+    def _record(self, result):
+        book, error, seconds = result
+        METRICS.record("parse", seconds)
+        if error:
+            raise ValueError(error)
+        return book
+
+    def close(self):
+        self.executor.shutdown()
+
+def book_link(article):
+    rel_link = article.find("h3").a["href"].replace("../../../", "")
+    return config.CATALOGUE_PREFIX + rel_link
+
+def parse_listing_card(article, page_url, category_name):
+    """Builds a partial Book from one article.product_pod on a listing page.
+
+    Fields that only exist on the product page (UPC, price excluding tax,
+    description) are left as None. The card only says 'In stock', so
+    number_available is None, and image_url points at the listing
+    thumbnail rather than the full cover.
+    """
+    link = article.find("h3").a
+    rating_tag = article.find("p", class_="star-rating")
+    price_tag = article.find("p", class_="price_color")
+    stock_tag = article.find("p", class_="availability")
+    img_tag = article.find("img")
+    return Book.parse(
+        product_page_url=book_link(article),
+        universal_product_code=None,
+        title=link.get("title", link.text),
+        price_including_tax=price_tag.text if price_tag else None,
+        price_excluding_tax=None,
+        number_available=stock_tag.text.strip() if stock_tag else None,
+        product_description=None,
+        category=category_name,
+        review_rating=rating_tag['class'][1] if rating_tag else "",
+        image_url=urllib.parse.urljoin(page_url, img_tag['src']) if img_tag else None
+    )
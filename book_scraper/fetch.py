@@ -0,0 +1,297 @@
+"""HTTP layer: pooled keep-alive session, conditional-request cache and per-host scheduler."""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+import urllib.parse
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import (BACKOFF_BASE, BACKOFF_MAX, CACHE_DIR, HOST_CONCURRENCY, MAX_RATE, MAX_RETRIES,
+                     MIN_RATE, POOL_SIZE, REQUEST_TIMEOUT, RETRY_STATUSES, TARGET_LATENCY)
+from .metrics import METRICS
+
+class HttpCache:
+    """On-disk store of response bodies together with their validators."""
+
+    def __init__(self, folder=CACHE_DIR):
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def _path(self, url, suffix):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.folder, key[:2], key + suffix)
+
+    def validators(self, url):
+        """Conditional request headers for a cached url ({} when not cached)."""
+        try:
+            with open(self._path(url, ".json"), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    def load(self, url):
+        try:
+            with open(self._path(url, ".body"), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def store(self, url, headers, body):
+        """Saves a 200 response body if the server gave us something to revalidate with."""
+        meta = {"etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified")}
+        if not (meta["etag"] or meta["last_modified"]):
+            return
+        body_path = self._path(url, ".body")
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        # Write to temp files first so a crash never leaves half a body behind
+        tmp = f".{threading.get_ident()}.tmp"
+        with open(body_path + tmp, 'wb') as f:
+            f.write(body)
+        os.replace(body_path + tmp, body_path)
+        meta_path = self._path(url, ".json")
+        with open(meta_path + tmp, 'w', encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(meta_path + tmp, meta_path)
+
+    def record(self, hit, size=0):
+        with self.lock:
+            if hit:
+                self.hits += 1
+                self.bytes_saved += size
+            else:
+                self.misses += 1
+
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+def retry_after(headers):
+    """Seconds asked for by a Retry-After header, or None."""
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(BACKOFF_MAX, max(0.0, seconds))
+
+class HostThrottle:
+    """Token bucket plus a cap on requests in flight for a single host.
+
+    The refill rate adapts to how the host is coping: it grows 10% after each
+    fast successful response, shrinks a little when responses get slow and
+    drops by a quarter on errors or throttling. A host failing more than about
+    one request in four is therefore slowed down until it recovers.
+    """
+
+    def __init__(self, max_rate=MAX_RATE, concurrency=HOST_CONCURRENCY, target_latency=TARGET_LATENCY):
+        self.max_rate = max_rate
+        self.rate = max(MIN_RATE, max_rate / 4)
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.concurrency = concurrency
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.target_latency = target_latency
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        """Blocks until a request to this host is allowed."""
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self.refill(now)
+                if now < self.paused_until:
+                    self.cond.wait(self.paused_until - now)
+                elif self.in_flight >= self.concurrency:
+                    self.cond.wait()
+                elif self.tokens < 1:
+                    self.cond.wait((1 - self.tokens) / self.rate)
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+
+    def release(self, latency, ok):
+        """Records how a request went and adjusts the rate."""
+        with self.cond:
+            self.in_flight -= 1
+            self.adapt(latency, ok)
+            self.cond.notify_all()
+
+    def adapt(self, latency, ok):
+        if not ok:
+            self.rate = max(MIN_RATE, self.rate * 0.75)
+        elif latency > self.target_latency:
+            self.rate = max(MIN_RATE, self.rate * 0.9)
+        else:
+            self.rate = min(self.max_rate, self.rate * 1.1)
+
+    def refill(self, now):
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def pause(self, seconds):
+        """Holds every request to this host for a while (Retry-After)."""
+        with self.cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class RequestScheduler:
+    """Rate limits, caps and retries every request, with one HostThrottle per host.
+
+    Connection errors, timeouts and 429/5xx responses are retried with
+    exponential backoff and full jitter, or after the server's Retry-After.
+    """
+
+    def __init__(self, max_rate=MAX_RATE, concurrency=HOST_CONCURRENCY, retries=MAX_RETRIES,
+                 target_latency=TARGET_LATENCY):
+        self.max_rate = max_rate
+        self.concurrency = concurrency
+        self.retries = retries
+        self.target_latency = target_latency
+        self.hosts = {}
+        self.lock = threading.Lock()
+        self.retried = 0
+
+    def throttle(self, url):
+        host = urllib.parse.urlsplit(url).netloc
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostThrottle(self.max_rate, self.concurrency, self.target_latency)
+            return self.hosts[host]
+
+    def send(self, url, send):
+        """Calls send() (which performs the request) under the host's limits, retrying failures."""
+        throttle = self.throttle(url)
+        for attempt in range(self.retries + 1):
+            throttle.acquire()
+            started = time.monotonic()
+            try:
+                response = send()
+            except (requests.ConnectionError, requests.Timeout):
+                throttle.release(time.monotonic() - started, ok=False)
+                if attempt == self.retries:
+                    raise
+                delay = backoff_delay(attempt)
+            else:
+                ok = response.status_code not in RETRY_STATUSES
+                throttle.release(time.monotonic() - started, ok)
+                if ok or attempt == self.retries:
+                    return response
+                delay = retry_after(response.headers)
+                if delay is not None:
+                    throttle.pause(delay)
+                else:
+                    delay = backoff_delay(attempt)
+                response.close()
+            with self.lock:
+                self.retried += 1
+            time.sleep(delay)
+
+    def report(self):
+        rates = ", ".join(f"{host} {throttle.rate:.1f} req/s" for host, throttle in self.hosts.items())
+        return f"Scheduler: {self.retried} retries; current rate {rates or 'n/a'}"
+
+class PooledSession(requests.Session):
+    """A requests.Session with a sized connection pool and a default timeout.
+
+    When given an HttpCache, GET requests are sent as conditional requests
+    and a 304 Not Modified is answered from the cached body. When given a
+    RequestScheduler, every request goes through its rate limits and retries.
+    When given a PageArchive, every page fetched with a plain GET (not
+    streamed, so not the cover images) is archived.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT, cache=None, scheduler=None, archive=None):
+        super().__init__()
+        self.timeout = timeout
+        self.cache = cache
+        self.scheduler = scheduler
+        self.archive = archive
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("http://", adapter)
+        self.mount("https://", adapter)
+
+    def _send(self, method, url, **kwargs):
+        if self.scheduler is None:
+            response = super().request(method, url, **kwargs)
+        else:
+            response = self.scheduler.send(url, lambda: super(PooledSession, self).request(method, url, **kwargs))
+        if not kwargs.get("stream"):
+            # What the server sent: nothing for a 304, even once the cached body is swapped in
+            METRICS.count("bytes_received", len(response.content))
+        return response
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        with METRICS.time("fetch"):
+            response = self._request(method, url, **kwargs)
+        METRICS.count("requests")
+        if self.archive and not kwargs.get("stream") and method.upper() == "GET" and response.status_code == 200:
+            self.archive.add(url, response.content, response.headers.get("Content-Type", "text/html"))
+        return response
+
+    def _request(self, method, url, **kwargs):
+        if self.cache is None or method.upper() != "GET" or kwargs.get("stream"):
+            return self._send(method, url, **kwargs)
+
+        validators = self.cache.validators(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        response = self._send(method, url, headers={**headers, **validators}, **kwargs)
+        if response.status_code == 304:
+            body = self.cache.load(url)
+            if body is not None:
+                self.cache.record(True, len(body))
+                METRICS.count("bytes_from_cache", len(body))
+                response.status_code = 200
+                response._content = body
+                return response
+            # The cached body went missing, so ask again without validators
+            response = self._send(method, url, headers=headers, **kwargs)
+        if response.status_code == 200:
+            self.cache.record(False)
+            self.cache.store(url, response.headers, response.content)
+        return response
+
+    def connection_stats(self):
+        """Returns (requests sent, connections opened) across every pooled host."""
+        sent = opened = 0
+        for adapter in set(self.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                if pool is not None:
+                    sent += pool.num_requests
+                    opened += pool.num_connections
+        return sent, opened
+
+_default_session = None
+_default_session_lock = threading.Lock()
+
+def default_session():
+    """The PooledSession used when a function is not given one (created on first use)."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = PooledSession()
+        return _default_session
@@ -0,0 +1,168 @@
+"""URL frontier: the book URLs found but not fetched yet, each handed out once."""
+import hashlib
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+
+from .config import FRONTIER_MEMORY, FRONTIER_PATH
+from .metrics import METRICS
+
+# Spilled URLs are read back from disk this many at a time
+REFILL_BATCH = 1000
+
+def url_key(url):
+    """64-bit hash of a URL, as an SQLite INTEGER (8 bytes on disk instead of the URL)."""
+    return int.from_bytes(hashlib.blake2b(url.encode(), digest_size=8).digest(), "big", signed=True)
+
+class Frontier:
+    """A priority queue of URLs plus the set of URLs already queued, in bounded memory.
+
+    push(url, priority) queues a URL unless it was pushed before; lower
+    priorities come out first and URLs of one priority in the order they
+    were pushed, so with the default priority it is breadth-first.
+    At most memory_urls URLs wait in memory and at most memory_urls hashes
+    of seen URLs are kept in a set; past that both spill to an SQLite file
+    at `path`, created on the first spill and deleted by close().
+
+    Thread-safe: one producer pushes and calls finish() when it has no more
+    URLs; workers call pop(), which waits for a URL and returns None once
+    the frontier is finished and empty (drain() yields until then).
+    """
+
+    def __init__(self, path=FRONTIER_PATH, memory_urls=FRONTIER_MEMORY):
+        self.path = path
+        self.memory_urls = max(1, memory_urls)
+        self.ready = threading.Condition()
+        self.heap = []  # (priority, seq, url)
+        self.order = itertools.count()
+        self.seen = set()
+        self.conn = None
+        self.on_disk = 0  # URLs waiting in the file
+        self.seen_on_disk = 0
+        self.disk_head = None  # first URL waiting in the file, when known
+        self.finished = False
+        self.queued = 0
+        self.duplicates = 0
+        self.spilled = 0
+
+    def _disk(self):
+        if self.conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if os.path.exists(self.path):
+                os.remove(self.path)  # left over from a crashed run
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=OFF")
+            self.conn.execute("PRAGMA synchronous=OFF")
+            self.conn.execute("CREATE TABLE queue (priority INTEGER, seq INTEGER, url TEXT, "
+                              "PRIMARY KEY (priority, seq)) WITHOUT ROWID")
+            self.conn.execute("CREATE TABLE seen (key INTEGER PRIMARY KEY)")
+            # The file only lives as long as the crawl, so it is never committed:
+            # everything stays in one open transaction this connection reads back
+        return self.conn
+
+    def _seen_before(self, url):
+        key = url_key(url)
+        if key in self.seen:
+            return True
+        if self.seen_on_disk and self.conn.execute("SELECT 1 FROM seen WHERE key = ?", (key,)).fetchone():
+            return True
+        self.seen.add(key)
+        if len(self.seen) >= self.memory_urls:
+            self._disk().executemany("INSERT OR IGNORE INTO seen VALUES (?)", ((k,) for k in self.seen))
+            self.seen_on_disk += len(self.seen)
+            self.seen.clear()
+        return False
+
+    def push(self, url, priority=0):
+        """Queues url; False when it was pushed before (or the frontier is finished)."""
+        with self.ready:
+            if self.finished:
+                return False
+            if self._seen_before(url):
+                self.duplicates += 1
+                METRICS.count("duplicate_urls")
+                return False
+            item = (priority, next(self.order), url)
+            if len(self.heap) < self.memory_urls:
+                heapq.heappush(self.heap, item)
+            else:
+                self._disk().execute("INSERT INTO queue VALUES (?, ?, ?)", item)
+                self.on_disk += 1
+                self.spilled += 1
+                if self.disk_head is not None and item < self.disk_head:
+                    self.disk_head = item
+            self.queued += 1
+            self.ready.notify()
+            return True
+
+    def _first_on_disk(self):
+        if self.disk_head is None and self.on_disk:
+            self.disk_head = self.conn.execute(
+                "SELECT priority, seq, url FROM queue ORDER BY priority, seq LIMIT 1").fetchone()
+        return self.disk_head
+
+    def _refill(self):
+        # Moves the first spilled URLs back into the (empty) heap in one query
+        rows = self.conn.execute("SELECT priority, seq, url FROM queue ORDER BY priority, seq LIMIT ?",
+                                 (min(REFILL_BATCH, self.memory_urls),)).fetchall()
+        self.conn.execute("DELETE FROM queue WHERE (priority, seq) <= (?, ?)", rows[-1][:2])
+        self.on_disk -= len(rows)
+        self.disk_head = None
+        self.heap = rows  # already sorted, so already a heap
+
+    def _take(self):
+        if not self.heap:
+            self._refill()
+        head = self._first_on_disk()
+        if head is not None and head < self.heap[0]:
+            # Pushed with a lower priority while the heap was full
+            self.conn.execute("DELETE FROM queue WHERE priority = ? AND seq = ?", head[:2])
+            self.on_disk -= 1
+            self.disk_head = None
+            return head[2]
+        return heapq.heappop(self.heap)[2]
+
+    def pop(self, timeout=None):
+        """The next URL, waiting for one if needed; None once finished and empty (or on timeout)."""
+        with self.ready:
+            if not self.ready.wait_for(lambda: self.heap or self.on_disk or self.finished, timeout):
+                return None
+            if not (self.heap or self.on_disk):
+                return None
+            return self._take()
+
+    def drain(self):
+        """Yields URLs as they are pushed until the frontier is finished and empty."""
+        while True:
+            url = self.pop()
+            if url is None:
+                return
+            yield url
+
+    def finish(self):
+        """No more URLs will be pushed; waiting workers get what is left, then None."""
+        with self.ready:
+            self.finished = True
+            self.ready.notify_all()
+
+    def __len__(self):
+        return len(self.heap) + self.on_disk
+
+    def close(self):
+        self.finish()
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def report(self):
+        return (f"Frontier: {self.queued} URLs queued, {self.duplicates} duplicates skipped, "
+                f"{self.spilled} spilled to disk")
@@ -0,0 +1,212 @@
+"""Cover images: content-addressed store, streaming download and the download pool."""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import IMAGE_CHUNK_SIZE, IMAGE_DIR, IMAGE_WORKERS
+from .fetch import default_session
+from .metrics import METRICS
+from .utils import slugify
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(IMAGE_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class ImageStore:
+    """Content-addressed image storage: every distinct image is stored once,
+    under objects/<sha256>.jpg, however many books or categories use it.
+
+    The usual scraped_data/images/<category>/<title>.jpg files are hard links
+    to those objects, and manifest.jsonl records UPC -> hash -> path for every
+    book. An image URL whose hash is already stored is never downloaded again.
+    """
+
+    def __init__(self, folder=IMAGE_DIR, refresh_older_than=None):
+        self.folder = folder
+        self.objects = os.path.join(folder, "objects")
+        os.makedirs(self.objects, exist_ok=True)
+        self.stale_before = time.time() - refresh_older_than if refresh_older_than is not None else None
+        self.lock = threading.Lock()
+        self.by_upc = {}   # upc -> manifest entry
+        self.by_url = {}   # image url -> manifest entry
+        self.owners = {}   # category file path -> upc
+        self.duplicates = 0
+        manifest_path = os.path.join(folder, "manifest.jsonl")
+        lines = 0
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        self._remember(json.loads(line))
+                        lines += 1
+        # The manifest is append-only; rewrite it once it is mostly superseded entries
+        if lines > 2 * len(self.by_upc) + 100:
+            with open(manifest_path + ".tmp", 'w', encoding='utf-8') as f:
+                for entry in self.by_upc.values():
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(manifest_path + ".tmp", manifest_path)
+        self.manifest = open(manifest_path, 'a', encoding='utf-8')
+
+    def _remember(self, entry):
+        self.by_upc[entry["upc"]] = entry
+        self.by_url[entry["url"]] = entry
+        self.owners[entry["path"]] = entry["upc"]
+
+    def object_path(self, sha256):
+        return os.path.join(self.objects, sha256[:2], sha256 + ".jpg")
+
+    def known_hash(self, img_url, verify=False):
+        """The stored hash for img_url, or None if it has to be downloaded."""
+        entry = self.by_url.get(img_url)
+        if entry is None or (self.stale_before is not None and entry["saved_at"] < self.stale_before):
+            return None
+        path = self.object_path(entry["sha256"])
+        if not os.path.exists(path) or (verify and file_sha256(path) != entry["sha256"]):
+            return None
+        return entry["sha256"]
+
+    def add(self, tmp_path, sha256):
+        """Moves a downloaded file into the store, dropping it if the bytes are already there."""
+        path = self.object_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            with self.lock:
+                self.duplicates += 1
+        else:
+            os.replace(tmp_path, path)
+
+    def link(self, img_url, sha256, category_name, book_title, upc):
+        """Points the book's category file at the stored object and records it."""
+        img_dir = os.path.join(self.folder, slugify(category_name))
+        os.makedirs(img_dir, exist_ok=True)
+        with self.lock:
+            path = os.path.join(img_dir, f"{slugify(book_title)}.jpg")
+            # Two different books whose titles slugify the same keep separate files
+            if self.owners.get(path, upc) != upc:
+                path = os.path.join(img_dir, f"{slugify(book_title)}_{slugify(upc or '')}.jpg")
+            entry = {"upc": upc, "url": img_url, "sha256": sha256, "path": path, "saved_at": time.time()}
+            self._remember(entry)
+            self.manifest.write(json.dumps(entry) + "\n")
+            self.manifest.flush()
+
+        target = self.object_path(sha256)
+        if os.path.exists(path) and os.path.samefile(path, target):
+            return path
+        tmp_path = f"{path}.{threading.get_ident()}.link"
+        try:
+            os.link(target, tmp_path)
+        except OSError:
+            shutil.copyfile(target, tmp_path)  # no hard links on this filesystem
+        os.replace(tmp_path, path)
+        return path
+
+    def close(self):
+        self.manifest.close()
+
+def download_image(img_url, category_name, book_title, upc=None, session=None, store=None, verify=False):
+    """Saves a book's cover image into the image store and its category folder.
+
+    Returns the number of bytes downloaded (0 when the image was already
+    stored) or None if the download failed.
+    """
+    session = session or default_session()
+    own_store = store is None
+    store = store or ImageStore()
+    try:
+        sha256 = store.known_hash(img_url, verify)
+        downloaded = 0
+        if sha256 is None:
+            # Stream in chunks into a temporary file, hashing as we go
+            tmp_path = os.path.join(store.objects, f"incoming-{threading.get_ident()}.part")
+            digest = hashlib.sha256()
+            try:
+                with session.get(img_url, stream=True) as response:
+                    response.raise_for_status()
+                    with open(tmp_path, 'wb') as handler, METRICS.time("image_download"):
+                        for chunk in response.iter_content(IMAGE_CHUNK_SIZE):
+                            handler.write(chunk)
+                            digest.update(chunk)
+                            downloaded += len(chunk)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            sha256 = digest.hexdigest()
+            with METRICS.time("image_save"):
+                store.add(tmp_path, sha256)
+        with METRICS.time("image_save"):
+            store.link(img_url, sha256, category_name, book_title, upc)
+        METRICS.count("images_saved")
+        METRICS.count("image_bytes", downloaded)
+        return downloaded
+    except Exception as e:
+        print(f"Failed to download image for {book_title}: {e}")
+        return None
+    finally:
+        if own_store:
+            store.close()
+
+class ImagePipeline:
+    """Downloads cover images on a separate pool of workers.
+
+    Scraping hands each image over with submit() and carries on with the next
+    page. submit() blocks once enough downloads are queued, so the queue stays
+    small. close() waits for the remaining downloads. With workers=0 each
+    image is downloaded straight away by the caller.
+    """
+
+    def __init__(self, workers=IMAGE_WORKERS, session=None, store=None, verify=False):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="images") if workers > 0 else None
+        self.slots = threading.BoundedSemaphore(max(workers, 1) * 4)
+        self.session = session
+        self.store = store or ImageStore()
+        self.verify = verify
+        self.lock = threading.Lock()
+        self.downloaded = 0
+        self.skipped = 0
+        self.failed = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+
+    def submit(self, img_url, category_name, book_title, upc=None):
+        work = (download_image, img_url, category_name, book_title, upc, self.session, self.store, self.verify)
+        if self.executor is None:
+            self.record(work[0](*work[1:]))
+            return
+        self.slots.acquire()
+        future = self.executor.submit(*work)
+        future.add_done_callback(self._finished)
+
+    def _finished(self, future):
+        self.slots.release()
+        self.record(future.result())
+
+    def record(self, size):
+        """Counts one finished download (download_image's return value)."""
+        with self.lock:
+            if size is None:
+                self.failed += 1
+            elif size == 0:
+                self.skipped += 1
+            else:
+                self.downloaded += 1
+                self.bytes += size
+
+    def close(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+        self.store.close()
+
+    def report(self):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (f"Images: {self.downloaded} downloaded ({self.store.duplicates} were duplicates of a stored image), "
+                f"{self.skipped} already stored, {self.failed} failed "
+                f"({self.downloaded / elapsed:.1f} images/sec, {self.bytes / 1024 / elapsed:.0f} KB/sec)")
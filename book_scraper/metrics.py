@@ -0,0 +1,145 @@
+"""Per-stage timings and counters, and the optional extraction profiler."""
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+
+from .config import METRICS_SAMPLE_SIZE
+
+class Metrics:
+    """Timings, counters and byte totals for each crawl stage, shared by every thread.
+
+    Stages are timed with `with METRICS.time("fetch"):` and summarised as
+    p50/p95/p99 latencies and throughput at the end of the crawl.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.samples = defaultdict(list)
+            self.stage_counts = defaultdict(int)
+            self.stage_totals = defaultdict(float)
+            self.counters = defaultdict(int)
+            self.start = time.perf_counter()
+
+    @contextmanager
+    def time(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.stage_counts[stage] += 1
+            self.stage_totals[stage] += seconds
+            samples = self.samples[stage]
+            if len(samples) < METRICS_SAMPLE_SIZE:
+                samples.append(seconds)
+            else:
+                # Reservoir sampling keeps every timing equally likely to be in the sample
+                slot = random.randrange(self.stage_counts[stage])
+                if slot < METRICS_SAMPLE_SIZE:
+                    samples[slot] = seconds
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def summary(self):
+        """Everything measured so far as a JSON-friendly dict."""
+        with self.lock:
+            elapsed = time.perf_counter() - self.start
+            stages = {}
+            for stage, samples in self.samples.items():
+                ordered = sorted(samples)
+
+                def percentile(q):
+                    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+                stages[stage] = {
+                    "count": self.stage_counts[stage],
+                    "total_seconds": round(self.stage_totals[stage], 4),
+                    "p50_ms": round(percentile(0.50), 3),
+                    "p95_ms": round(percentile(0.95), 3),
+                    "p99_ms": round(percentile(0.99), 3),
+                    "per_second": round(self.stage_counts[stage] / elapsed, 2) if elapsed else 0,
+                }
+            return {"elapsed_seconds": round(elapsed, 3), "stages": stages, "counters": dict(self.counters)}
+
+    def write_json(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def prometheus_text(self):
+        """The summary in the Prometheus text exposition format."""
+        summary = self.summary()
+        lines = ["# TYPE scraper_stage_seconds summary"]
+        for stage, values in summary["stages"].items():
+            for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+                lines.append(f'scraper_stage_seconds{{stage="{stage}",quantile="{quantile}"}} '
+                             f'{values[key] / 1000}')
+            lines.append(f'scraper_stage_seconds_sum{{stage="{stage}"}} {values["total_seconds"]}')
+            lines.append(f'scraper_stage_seconds_count{{stage="{stage}"}} {values["count"]}')
+        for name, value in sorted(summary["counters"].items()):
+            lines.append(f"# TYPE scraper_{name}_total counter")
+            lines.append(f"scraper_{name}_total {value}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port):
+        """Serves /metrics for Prometheus (or curl) from a background thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+METRICS = Metrics()
+
+class ExtractionProfiler:
+    """Opt-in cProfile of the extraction functions.
+
+    One profiler is shared behind a lock, so extraction runs one page at a
+    time while profiling; the rest of the crawl is unaffected.
+    """
+
+    def __init__(self):
+        import cProfile
+        self.profile = cProfile.Profile()
+        self.lock = threading.Lock()
+
+    def wrap(self, fn):
+        @wraps(fn)
+        def profiled(*args, **kwargs):
+            with self.lock:
+                return self.profile.runcall(fn, *args, **kwargs)
+        return profiled
+
+    def report(self, path, limit=15):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        import pstats
+        self.profile.dump_stats(path)
+        pstats.Stats(self.profile).sort_stats("cumulative").print_stats(limit)
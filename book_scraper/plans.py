@@ -0,0 +1,298 @@
+"""Extraction plans: a page's fields declared as selector -> cleaner, compiled into one pass over the HTML.
+
+A plan is a dict of Fields, e.g.
+
+    {"title": Field(Text("h1"), required=True),
+     "review_rating": Field(Attr("p", "class", class_="star-rating"), clean=lambda v: v.split()[1])}
+
+ExtractionPlan compiles it into a single regular expression that only
+stops at the tags some field needs (plus comments and scripts to skip),
+and fills every field in one left-to-right scan, so adding a field adds
+no extra search of the document.
+"""
+import html
+import re
+import urllib.parse
+
+# Elements that never have a closing tag, so never have text
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "wbr"}
+
+ATTRIBUTE = re.compile(r"""([^\s=/>]+)(?:\s*=\s*("[^"]*"|'[^']*'|[^\s>]+))?""")
+MARKUP = re.compile(r"<!--.*?-->|<[a-zA-Z/!][^>]*>", re.S)
+# A start tag's attribute text, one character or quoted value per step: a quote that
+# never closes makes the match fail in linear time instead of backtracking through it
+ATTRIBUTE_TEXT = r"""(?:[^>"']|"[^"]*"|'[^']*')*"""
+# Any tag, for element_end
+ANY_TAG = re.compile(rf"<!--.*?-->|<(?:script|style)\b.*?</(?:script|style)\s*>|<(/?)([a-zA-Z][^\s/>]*)({ATTRIBUTE_TEXT})>",
+                     re.S | re.I)
+
+def parse_attributes(text):
+    """{name: value} of a start tag's attribute text, unescaped like HTMLParser does."""
+    attrs = {}
+    for name, value in ATTRIBUTE.findall(text):
+        if value[:1] in ("'", '"'):
+            value = value[1:-1]
+        attrs.setdefault(name.lower(), html.unescape(value))
+    return attrs
+
+def element_end(page, name, start):
+    """Where the <name> element whose inner HTML starts at start ends, as BeautifulSoup's
+    html.parser builder decides it: at its own end tag, at the end tag of an element it is
+    inside (which closes it too) or at the end of the page."""
+    opened = {name: 1}
+    for token in ANY_TAG.finditer(page, start):
+        closing, tag, attribute_text = token.groups()
+        if tag is None:
+            continue  # a comment or script
+        tag = tag.lower()
+        if not closing:
+            if tag not in VOID_TAGS and not attribute_text.endswith("/"):
+                opened[tag] = opened.get(tag, 0) + 1
+        elif not opened.get(tag):
+            return token.start()  # an enclosing element ends
+        else:
+            opened[tag] -= 1
+            if tag == name and not opened[tag]:
+                return token.start()
+    return len(page)
+
+def element_text(markup):
+    """The text of an element's inner HTML, as BeautifulSoup's .text gives it."""
+    return html.unescape(MARKUP.sub("", markup)) if "<" in markup or "&" in markup else markup
+
+class Tag:
+    """Matches a start tag by name and, optionally, its id and one of its classes."""
+
+    def __init__(self, name, id=None, class_=None):
+        self.name = name
+        self.id = id
+        self.class_ = class_
+
+    def needs_attributes(self):
+        return self.id is not None or self.class_ is not None
+
+    def hint(self):
+        """Text the start tag must contain to match (None: any start tag may)."""
+        return self.id or self.class_
+
+    def matches(self, attrs):
+        if self.id is not None and attrs.get("id") != self.id:
+            return False
+        return self.class_ is None or self.class_ in attrs.get("class", "").split()
+
+class Select(Tag):
+    """The index-th element matching the tag (the first by default), like soup.find.
+
+    within: only count elements inside the first element matching that Tag
+    (soup.find(within).find_all(tag)[index]).
+    after: only count elements that start after the first element matching
+    that Tag does (soup.find(after).find_next(tag)).
+    """
+
+    def __init__(self, name, id=None, class_=None, within=None, after=None, index=0):
+        super().__init__(name, id, class_)
+        self.within = within
+        self.after = after
+        self.index = index
+
+class Text(Select):
+    """The text of the selected element."""
+
+class Attr(Select):
+    """An attribute of the selected element (a ValueError if it does not have it)."""
+
+    def __init__(self, name, attr, **kwargs):
+        super().__init__(name, **kwargs)
+        self.attr = attr
+
+    def needs_attributes(self):
+        return True
+
+    def hint(self):
+        return None if self.id is None and self.class_ is None else super().hint()
+
+class Row:
+    """The <td> text of the table row whose <th> text is key (the last such row, as a dict would keep)."""
+
+    def __init__(self, key):
+        self.key = key
+
+class Field:
+    """What one output field is: where it is found and how its text is cleaned.
+
+    clean is applied to the text found; default is used when nothing is
+    found (or a ValueError is raised if the field is required). With
+    url=True the text is resolved against the page URL.
+    """
+
+    def __init__(self, selector, clean=None, default=None, required=False, url=False):
+        self.selector = selector
+        self.clean = clean
+        self.default = default
+        self.required = required
+        self.url = url
+
+def add_row(table, row):
+    if row.get("th") is None or row.get("td") is None:
+        raise ValueError("table row without <th> and <td>")
+    table[row["th"]] = row["td"]
+
+def alternation(names):
+    # Longest first, so no name is cut short by another it starts with
+    return "|".join(sorted(names, key=len, reverse=True))
+
+class ExtractionPlan:
+    """A dict of Fields compiled into a single-pass extractor: plan(html, page_url) -> {field: value}.
+
+    With stop_after the scan ends at the first closing tag of that name
+    (e.g. "table", when everything wanted comes before the end of the
+    product table), so the rest of the page is never looked at.
+    """
+
+    def __init__(self, fields, stop_after=None):
+        self.fields = fields
+        self.stop_after = stop_after
+        self.selects = [(name, field.selector) for name, field in fields.items()
+                        if isinstance(field.selector, Select)]
+        self.rows = {name: field.selector.key for name, field in fields.items() if isinstance(field.selector, Row)}
+        # For each tag: the selects it can fill, arm (after=) or contain (within=)
+        self.selecting, self.anchoring, self.containing = {}, {}, {}
+        for index, (_, select) in enumerate(self.selects):
+            self.selecting.setdefault(select.name, []).append(index)
+            if select.after:
+                self.anchoring.setdefault(select.after.name, []).append(index)
+            if select.within:
+                self.containing.setdefault(select.within.name, []).append(index)
+        opening = set(self.selecting) | set(self.anchoring) | set(self.containing)
+        # End tags only matter for text being collected, containers and where to stop
+        closing = {select.name for _, select in self.selects if isinstance(select, Text)} | set(self.containing)
+        if self.rows:
+            opening.update(("tr", "th", "td"))
+            closing.update(("tr", "th", "td"))
+        if stop_after:
+            closing.add(stop_after)
+        # A start tag's attributes are only parsed when one of these texts is in it (None: always)
+        self.hints = {}
+        for _, select in self.selects:
+            for tag in (select, select.within, select.after):
+                if tag and tag.needs_attributes():
+                    hints = self.hints.setdefault(tag.name, set())
+                    hints.add(tag.hint())
+        # Only the tags above stop the scan; comments and scripts are matched whole so nothing inside them does
+        self.pattern = re.compile(
+            rf"<(?:!--.*?-->|(?:script|style)\b.*?</(?:script|style)\s*>|/({alternation(closing)})\s*>"
+            rf"|({alternation(opening)})(?=[\s/>])({ATTRIBUTE_TEXT})>)",
+            re.S | re.I)
+
+    def scan(self, page):
+        """{field: text found} for every field found in page (a str), before cleaning."""
+        selects = self.selects
+        selecting, anchoring, containing, hints = self.selecting, self.anchoring, self.containing, self.hints
+        found = {}
+        seen = [0] * len(selects)
+        done = [False] * len(selects)
+        armed = [select.after is None for _, select in selects]
+        inside = [0 if select.within else None for _, select in selects]  # depth in `within`; None = anywhere
+        captures = []  # [tag, depth, start of inner HTML, dict and key its text goes to]
+        table = {}
+        row = None
+        for token in self.pattern.finditer(page):
+            tag, opening, attribute_text = token.groups()
+            if tag:
+                tag = tag.lower()
+                for capture in captures[:] if captures else ():
+                    if capture[0] == tag:
+                        capture[1] -= 1
+                        if capture[1] == 0:
+                            captures.remove(capture)
+                            capture[3][capture[4]] = element_text(page[capture[2]:token.start()])
+                if tag in containing:
+                    for index in containing[tag]:
+                        if inside[index]:
+                            inside[index] -= 1
+                            if inside[index] == 0:
+                                done[index] = True  # only the first `within` element counts
+                if row is not None and tag == "tr":
+                    add_row(table, row)
+                    row = None
+                if tag == self.stop_after:
+                    break
+                continue
+            if opening is None:
+                continue  # a comment or script
+            tag = opening.lower()
+            if tag in hints:
+                attrs = parse_attributes(attribute_text) if None in hints[tag] or any(
+                    hint in attribute_text for hint in hints[tag]) else {}
+            else:
+                attrs = {}
+            if captures and tag not in VOID_TAGS:
+                for capture in captures:
+                    if capture[0] == tag:
+                        capture[1] += 1
+            opened = []  # selects whose anchor or container is this very element
+            if tag in anchoring:
+                for index in anchoring[tag]:
+                    if not armed[index] and selects[index][1].after.matches(attrs):
+                        armed[index] = True
+                        opened.append(index)
+            if tag in containing:
+                for index in containing[tag]:
+                    if inside[index]:
+                        inside[index] += 1
+                    elif not done[index] and selects[index][1].within.matches(attrs):
+                        inside[index] = 1
+                        opened.append(index)
+            for index in selecting.get(tag, ()):
+                name, select = selects[index]
+                if done[index] or not armed[index] or inside[index] == 0 or index in opened \
+                        or not select.matches(attrs):
+                    continue
+                seen[index] += 1
+                if seen[index] <= select.index:
+                    continue
+                done[index] = True
+                if isinstance(select, Attr):
+                    if select.attr not in attrs:
+                        raise ValueError(f"<{tag}> has no {select.attr}")
+                    found[name] = attrs[select.attr]
+                elif tag in VOID_TAGS:
+                    found[name] = ""
+                else:
+                    captures.append([tag, 1, token.end(), found, name])
+            if self.rows:
+                if tag == "tr":
+                    row = {}
+                elif tag in ("th", "td") and row is not None and tag not in row:
+                    row[tag] = None
+                    captures.append([tag, 1, token.end(), row, tag])
+        # Elements still open at the end of the scan (or of the page) are read to where they end
+        for tag, _, start, target, key in captures:
+            target[key] = element_text(page[start:element_end(page, tag, start)])
+        if row is not None:
+            add_row(table, row)
+        for name, key in self.rows.items():
+            if key in table:
+                found[name] = table[key]
+        return found
+
+    def clean(self, found, page_url=None):
+        """{field: cleaned value} for every field of the plan, from what scan() found."""
+        values = {}
+        for name, field in self.fields.items():
+            if name not in found:
+                if field.required:
+                    raise ValueError(f"no {name} on the page")
+                values[name] = field.default
+                continue
+            value = found[name]
+            if field.clean:
+                value = field.clean(value)
+            if field.url:
+                value = urllib.parse.urljoin(page_url, value)
+            values[name] = value
+        return values
+
+    def __call__(self, page, page_url=None):
+        """{field: cleaned value} for every field of the plan."""
+        return self.clean(self.scan(page), page_url)
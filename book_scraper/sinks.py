@@ -0,0 +1,209 @@
+"""Where finished rows go: CSV files, or typed Parquet / Arrow IPC files."""
+import csv
+import os
+import time
+
+from .book import BOOK_FIELDS, parse_price, parse_rating, parse_stock, text_getter
+from .metrics import METRICS
+
+class CsvSink:
+    """Writes Books to a CSV as soon as they arrive instead of keeping them all in memory.
+
+    fields picks and orders the columns (every field by default), written
+    as the site's text. Rows go to '<filename>.part' and are flushed every
+    flush_every rows. The file only gets its real name when the sink is
+    closed, so an interrupted run never leaves a half-written CSV behind
+    (the .part file keeps the rows).
+    """
+
+    def __init__(self, filename, fields=None, flush_every=100):
+        self.filename = filename
+        self.part_filename = filename + ".part"
+        self.fields = fields or BOOK_FIELDS
+        self.text_values = text_getter(self.fields)
+        self.flush_every = flush_every
+        self.rows = 0
+        self.first_row_at = None  # time.perf_counter() of the first row
+        self.file = None
+        self.writer = None
+
+    def write(self, row):
+        with METRICS.time("write"):
+            self._write(row)
+        METRICS.count("rows_written")
+
+    def _write(self, book):
+        if self.writer is None:
+            self.file = open(self.part_filename, 'w', newline='', encoding='utf-8')
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(self.fields)
+            self.first_row_at = time.perf_counter()
+        self.writer.writerow(self.text_values(book))
+        self.rows += 1
+        if self.rows % self.flush_every == 0:
+            self.file.flush()
+
+    def close(self):
+        """Finishes the CSV and moves it into place (nothing is written for zero rows)."""
+        if self.file:
+            self.file.close()
+            os.replace(self.part_filename, self.filename)
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.file:
+            self.file.close()
+            self.file = None
+
+class NullSink:
+    """Counts rows like CsvSink but writes nothing (used when only the images are wanted)."""
+
+    def __init__(self, fields=None):
+        self.rows = 0
+        self.first_row_at = None
+
+    def write(self, row):
+        if self.first_row_at is None:
+            self.first_row_at = time.perf_counter()
+        self.rows += 1
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+# Columns stored as numbers in the typed outputs; every other column is a string
+TYPED_COLUMNS = {
+    "price_including_tax": parse_price,
+    "price_excluding_tax": parse_price,
+    "number_available": parse_stock,
+    "review_rating": parse_rating,
+}
+
+def typed_row(row):
+    """A text record (e.g. a CSV row read back) with prices as Decimal, stock as int
+    and the rating as 1-5, like the fields of a Book."""
+    return {field: TYPED_COLUMNS[field](value) if field in TYPED_COLUMNS else value
+            for field, value in row.items()}
+
+def import_pyarrow():
+    """pyarrow is only needed for --format parquet/arrow, so it is imported on demand."""
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow output need pyarrow: pip install pyarrow") from None
+    return pyarrow
+
+def arrow_schema(fields):
+    pa = import_pyarrow()
+    types = {
+        "price_including_tax": pa.decimal128(10, 2),
+        "price_excluding_tax": pa.decimal128(10, 2),
+        "number_available": pa.int32(),
+        "review_rating": pa.int8(),
+    }
+    return pa.schema([(field, types.get(field, pa.string())) for field in fields])
+
+class ColumnarSink:
+    """Writes Books to a columnar file, one record batch per batch_size rows.
+
+    The Book fields are already typed, so each batch is built column by
+    column. Like CsvSink the file is written as '<filename>.part' and
+    renamed on close. Subclasses open the actual writer (Parquet or Arrow IPC).
+    """
+
+    def __init__(self, filename, fields=None, batch_size=1000):
+        self.pa = import_pyarrow()
+        self.filename = filename
+        self.part_filename = filename + ".part"
+        self.fields = fields or BOOK_FIELDS
+        self.batch_size = batch_size
+        self.rows = 0
+        self.first_row_at = None
+        self.schema = arrow_schema(self.fields)
+        self.writer = None
+        self.batch = []
+
+    def open_writer(self, path, schema):
+        raise NotImplementedError
+
+    def write(self, book):
+        with METRICS.time("write"):
+            if self.first_row_at is None:
+                self.first_row_at = time.perf_counter()
+            self.batch.append(book)
+            self.rows += 1
+            if len(self.batch) >= self.batch_size:
+                self._flush()
+        METRICS.count("rows_written")
+
+    def _flush(self):
+        if not self.batch:
+            return
+        if self.writer is None:
+            self.writer = self.open_writer(self.part_filename, self.schema)
+        columns = list(zip(*self.batch))
+        arrays = [self.pa.array(columns[BOOK_FIELDS.index(field.name)], type=field.type) for field in self.schema]
+        self.writer.write_batch(self.pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.batch = []
+
+    def close(self):
+        """Writes the last batch and moves the file into place (nothing is written for zero rows)."""
+        self._flush()
+        if self.writer:
+            self.writer.close()
+            os.replace(self.part_filename, self.filename)
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        elif self.writer:
+            self.writer.close()
+            self.writer = None
+
+class ParquetSink(ColumnarSink):
+    def open_writer(self, path, schema):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter(path, schema, compression="zstd")
+
+class ArrowSink(ColumnarSink):
+    def open_writer(self, path, schema):
+        import pyarrow.ipc
+        return pyarrow.ipc.new_file(path, schema)
+
+# --format name -> (sink class, file extension)
+SINKS = {
+    "csv": (CsvSink, ".csv"),
+    "parquet": (ParquetSink, ".parquet"),
+    "arrow": (ArrowSink, ".arrow"),
+}
+
+def output_folder(output_format, listing_only=False):
+    """scraped_data/csv, scraped_data/parquet, ... (listing_* for listing-only rows)."""
+    return f"scraped_data/{'listing_' if listing_only else ''}{output_format}"
+
+def open_sink(output_format, name, listing_only=False, catalogue=None, fields=None):
+    """The sink for one category's Books, or a NullSink when output_format is None.
+
+    fields limits (and orders) the columns written. "sqlite" rows go into
+    the shared Catalogue instead of a file per category.
+    """
+    if output_format is None:
+        return NullSink(fields)
+    if output_format == "sqlite":
+        return catalogue.sink(fields)
+    sink_class, extension = SINKS[output_format]
+    return sink_class(os.path.join(output_folder(output_format, listing_only), name + extension), fields)
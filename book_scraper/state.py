@@ -0,0 +1,66 @@
+"""Crawl progress saved in SQLite so an interrupted run can resume."""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .book import Book
+from .config import STATE_PATH
+
+class CrawlState:
+    """Remembers finished category listings and product pages (SQLite).
+
+    Entries older than refresh_older_than seconds count as not done, so they
+    are fetched again; everything else is skipped on the next run. A crawl
+    that gets to the end calls finish(), so only an interrupted crawl resumes
+    and the next full run fetches everything again.
+    """
+
+    def __init__(self, path=STATE_PATH, refresh_older_than=None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.stale_before = time.time() - refresh_older_than if refresh_older_than is not None else None
+        with self.lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS listings "
+                              "(category_url TEXT PRIMARY KEY, book_urls TEXT, done_at REAL)")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS products "
+                              "(url TEXT PRIMARY KEY, category TEXT, data TEXT, done_at REAL)")
+
+    def _lookup(self, sql, key):
+        with self.lock:
+            row = self.conn.execute(sql, (key,)).fetchone()
+        if row is None or (self.stale_before is not None and row[-1] < self.stale_before):
+            return None
+        return row
+
+    def _save(self, sql, values):
+        with self.lock, self.conn:
+            self.conn.execute(sql, values + (time.time(),))
+
+    def get_listing(self, category_url):
+        row = self._lookup("SELECT book_urls, done_at FROM listings WHERE category_url = ?", category_url)
+        return json.loads(row[0]) if row else None
+
+    def save_listing(self, category_url, book_urls):
+        self._save("INSERT OR REPLACE INTO listings VALUES (?, ?, ?)", (category_url, json.dumps(book_urls)))
+
+    def get_product(self, url):
+        row = self._lookup("SELECT data, done_at FROM products WHERE url = ?", url)
+        return Book.from_text(json.loads(row[0])) if row else None
+
+    def save_product(self, url, category, book):
+        self._save("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?)",
+                   (url, category, json.dumps(book.text())))
+
+    def finish(self, categories):
+        """Forgets the progress of categories ({name: listing URL}) that were crawled to the end."""
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM listings WHERE category_url = ?",
+                                  ((url,) for url in categories.values()))
+            self.conn.executemany("DELETE FROM products WHERE category = ?", ((name,) for name in categories))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,14 @@
+"""Small helpers shared by the other modules."""
+import re
+
+def parse_age(text):
+    """Turns '90', '30m', '12h' or '7d' into a number of seconds."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = text.strip().lower()
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+def slugify(text):
+    """Converts titles into filesystem-safe filenames."""
+    return re.sub(r'[^\w\s-]', '', text).strip().lower().replace(' ', '_')
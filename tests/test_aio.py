@@ -0,0 +1,92 @@
+"""AsyncSession: the per-host cap and adaptive rate of a threaded crawl, on the event loop."""
+import asyncio
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from book_scraper import aio  # noqa: E402
+from book_scraper.aio import AsyncSession  # noqa: E402
+
+class CountingServer(ThreadingHTTPServer):
+    """Answers slowly, failing the first `failures` requests with 503, and records the most in flight."""
+
+    daemon_threads = True
+
+    def __init__(self, delay=0.05, failures=0):
+        super().__init__(("127.0.0.1", 0), CountingHandler)
+        self.delay = delay
+        self.failures = failures
+        self.in_flight = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+class CountingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.peak = max(server.peak, server.in_flight)
+            status = 503 if server.failures > 0 else 200
+            server.failures -= 1
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        self.send_response(status)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**kwargs):
+        server = CountingServer(**kwargs)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def fetch_all(urls, **kwargs):
+    async def run():
+        async with AsyncSession(**kwargs) as session:
+            bodies = await asyncio.gather(*(session.get(url) for url in urls))
+            return session, bodies
+    return asyncio.run(run())
+
+def test_host_concurrency_caps_requests_to_one_host(serve):
+    server, root = serve()
+    session, bodies = fetch_all([f"{root}/{index}" for index in range(24)], concurrency=100, max_rate=100000,
+                                host_concurrency=3)
+    assert bodies == [b"ok"] * 24
+    assert server.peak == 3
+    assert session.peak_in_flight > 3  # the others waited for the host, not for the crawl limit
+
+def test_rate_backs_off_on_errors_and_recovers(serve, monkeypatch):
+    monkeypatch.setattr(aio, "backoff_delay", lambda attempt: 0.0)
+    server, root = serve(delay=0, failures=4)
+    session, bodies = fetch_all([f"{root}/0"], max_rate=40, retries=5)
+    throttle, = session.hosts.values()
+    assert bodies == [b"ok"] and session.retried == 4
+    assert throttle.rate == pytest.approx(40 / 4 * 0.75 ** 4 * 1.1)
+    session, _ = fetch_all([f"{root}/{index}" for index in range(40)], max_rate=40)
+    throttle, = session.hosts.values()
+    assert throttle.rate == 40
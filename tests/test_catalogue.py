@@ -0,0 +1,74 @@
+"""Catalogue: books upserted by UPC, with a price history."""
+import os
+import sqlite3
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from book_scraper.book import Book  # noqa: E402
+from book_scraper.catalogue import Catalogue  # noqa: E402
+
+def book(upc, price="£10.00", stock="In stock (3 available)", title="A Book"):
+    return Book.parse(f"http://books.toscrape.com/catalogue/{upc}/index.html", upc, title, price, price, stock,
+                      "A book.", "Travel", "Three", f"http://books.toscrape.com/media/{upc}.jpg")
+
+def rows(path, sql):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+def test_upsert_updates_in_place(tmp_path):
+    path = str(tmp_path / "catalogue.db")
+    catalogue = Catalogue(path)
+    try:
+        catalogue.write([book("a"), book("b")])
+        catalogue.write([book("a", stock="In stock (1 available)", title="A Book, 2nd ed.")])
+    finally:
+        catalogue.close()
+    assert rows(path, "SELECT upc, title, price_pence, number_available, rating FROM books ORDER BY upc") == [
+        ("a", "A Book, 2nd ed.", 1000, 1, 3), ("b", "A Book", 1000, 3, 3)]
+    (first_seen, last_seen), = rows(path, "SELECT first_seen, last_seen FROM books WHERE upc = 'a'")
+    assert last_seen > first_seen
+
+def test_price_history_only_records_new_prices(tmp_path):
+    path = str(tmp_path / "catalogue.db")
+    catalogue = Catalogue(path)
+    try:
+        catalogue.write([book("a"), book("b")])
+        catalogue.write([book("a"), book("b")])  # nothing changed
+        catalogue.write([book("a", price="£12.50"), book("b")])
+        catalogue.write([book("a", price="£12.50")])
+    finally:
+        catalogue.close()
+    assert catalogue.price_changes == 3
+    assert rows(path, "SELECT upc, price_pence FROM price_history ORDER BY upc, seen_at") == [
+        ("a", 1000), ("a", 1250), ("b", 1000)]
+    assert rows(path, "SELECT price_pence FROM books WHERE upc = 'a'") == [(1250,)]
+
+def test_columns_left_out_of_fields_keep_their_value(tmp_path):
+    path = str(tmp_path / "catalogue.db")
+    catalogue = Catalogue(path)
+    try:
+        catalogue.write([book("a")])
+        catalogue.write([book("a", price="£9.00", title="Renamed")], fields=["universal_product_code", "title"])
+    finally:
+        catalogue.close()
+    assert rows(path, "SELECT title, price_pence FROM books") == [("Renamed", 1000)]
+    assert rows(path, "SELECT COUNT(*) FROM price_history") == [(1,)]
+
+def test_books_without_upc_are_skipped(tmp_path):
+    path = str(tmp_path / "catalogue.db")
+    catalogue = Catalogue(path)
+    try:
+        catalogue.write([book(None)])
+        sink = catalogue.sink(batch_size=2)
+        with sink:
+            for upc in "abc":
+                sink.write(book(upc))
+    finally:
+        catalogue.close()
+    assert rows(path, "SELECT upc FROM books ORDER BY upc") == [("a",), ("b",), ("c",)]
+    assert sink.rows == 3
@@ -0,0 +1,90 @@
+"""ChangeTracker: new, changed, unchanged and removed books between crawls."""
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from book_scraper.book import Book  # noqa: E402
+from book_scraper.delta import ChangeTracker  # noqa: E402
+
+CATEGORY = "Travel"
+
+def book(name, price="£10.00"):
+    return Book.parse(f"http://books.toscrape.com/catalogue/{name}/index.html", f"upc-{name}", name.title(),
+                      price, price, "In stock (3 available)", "A book.", CATEGORY, "Two",
+                      f"http://books.toscrape.com/media/{name}.jpg")
+
+def crawl(tmp_path, listed, scraped):
+    """One --delta run: the listing shows `listed`, and `scraped` are the Books whose pages worked.
+
+    Returns (counts, {url: change} written to the delta file).
+    """
+    tracker = ChangeTracker(str(tmp_path / "changes.db"), str(tmp_path / "deltas"))
+    try:
+        for name in listed:
+            tracker.note_card(f"http://books.toscrape.com/catalogue/{name}/index.html", f"card-{name}")
+        for record in scraped:
+            tracker.observe(record, CATEGORY)
+        tracker.finish([CATEGORY])
+    finally:
+        tracker.close()
+    with open(tracker.delta_path, encoding="utf-8") as f:
+        changes = {entry["record"]["product_page_url"]: entry["change"] for entry in map(json.loads, f)}
+    return tracker.counts, changes
+
+def test_first_run_reports_every_book_as_new(tmp_path):
+    counts, changes = crawl(tmp_path, ["a", "b"], [book("a"), book("b")])
+    assert counts == {"new": 2, "changed": 0, "unchanged": 0, "removed": 0}
+    assert set(changes.values()) == {"new"}
+
+def test_changed_and_unchanged(tmp_path):
+    crawl(tmp_path, ["a", "b"], [book("a"), book("b")])
+    counts, changes = crawl(tmp_path, ["a", "b"], [book("a"), book("b", price="£12.50")])
+    assert counts == {"new": 0, "changed": 1, "unchanged": 1, "removed": 0}
+    assert changes == {book("b").product_page_url: "changed"}
+
+def test_whitespace_only_changes_are_not_changes(tmp_path):
+    crawl(tmp_path, ["a"], [book("a")])
+    counts, _ = crawl(tmp_path, ["a"], [book("a")._replace(product_description="  A   book. ")])
+    assert counts["unchanged"] == 1 and counts["changed"] == 0
+
+def test_book_no_longer_listed_is_removed(tmp_path):
+    crawl(tmp_path, ["a", "b"], [book("a"), book("b")])
+    counts, changes = crawl(tmp_path, ["a"], [book("a")])
+    assert counts == {"new": 0, "changed": 0, "unchanged": 1, "removed": 1}
+    assert changes == {book("b").product_page_url: "removed"}
+    counts, _ = crawl(tmp_path, ["a", "b"], [book("a"), book("b")])
+    assert counts["new"] == 1  # it was forgotten when removed
+
+def test_listed_book_whose_page_failed_is_not_removed(tmp_path):
+    crawl(tmp_path, ["a", "b"], [book("a"), book("b")])
+    counts, changes = crawl(tmp_path, ["a", "b"], [book("a")])  # b's product page failed
+    assert counts == {"new": 0, "changed": 0, "unchanged": 1, "removed": 0}
+    assert changes == {}
+    counts, changes = crawl(tmp_path, ["a", "b"], [book("a"), book("b")])  # and works again
+    assert counts == {"new": 0, "changed": 0, "unchanged": 2, "removed": 0}
+    assert changes == {}
+
+def test_books_discovered_without_cards_are_listed(tmp_path):
+    # --global-listing notes the URLs it discovers instead of listing cards
+    crawl(tmp_path, ["a", "b"], [book("a"), book("b")])
+    tracker = ChangeTracker(str(tmp_path / "changes.db"), str(tmp_path / "deltas"))
+    try:
+        tracker.note_listed(book("a").product_page_url)
+        tracker.note_listed(book("b").product_page_url)
+        tracker.observe(book("a"), CATEGORY)
+        tracker.finish([CATEGORY])
+    finally:
+        tracker.close()
+    assert tracker.counts["removed"] == 0
+
+def test_unchanged_record_is_found_by_card_hash(tmp_path):
+    crawl(tmp_path, ["a"], [book("a")])
+    tracker = ChangeTracker(str(tmp_path / "changes.db"), str(tmp_path / "deltas"))
+    try:
+        assert tracker.unchanged_record(book("a").product_page_url, "card-a") == book("a")
+        assert tracker.unchanged_record(book("a").product_page_url, "another card") is None
+    finally:
+        tracker.close()
@@ -0,0 +1,77 @@
+"""Frontier: URLs handed out once, in order, spilling to disk past its memory budget."""
+import os
+import sys
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from book_scraper.frontier import Frontier  # noqa: E402
+
+def urls(count, prefix="book"):
+    return [f"http://books.toscrape.com/catalogue/{prefix}-{index}/index.html" for index in range(count)]
+
+def drain_now(frontier):
+    frontier.finish()
+    return list(frontier.drain())
+
+def test_in_memory_order_and_duplicates(tmp_path):
+    with Frontier(str(tmp_path / "frontier.db"), memory_urls=100) as frontier:
+        assert [frontier.push(url) for url in urls(3)] == [True, True, True]
+        assert not frontier.push(urls(3)[1])
+        assert drain_now(frontier) == urls(3)
+        assert frontier.conn is None  # never spilled
+        assert (frontier.queued, frontier.duplicates, frontier.spilled) == (3, 1, 0)
+
+def test_spill_and_refill_keep_push_order(tmp_path):
+    path = str(tmp_path / "frontier.db")
+    with Frontier(path, memory_urls=7) as frontier:
+        for url in urls(50):
+            frontier.push(url)
+        assert frontier.spilled == 43 and len(frontier) == 50
+        assert os.path.exists(path)
+        # Every URL is remembered, in memory or on disk, after the refills too
+        assert not any(frontier.push(url) for url in urls(50))
+        assert drain_now(frontier) == urls(50)
+        assert frontier.duplicates == 50
+    assert not os.path.exists(path)
+
+def test_priorities_across_memory_and_disk(tmp_path):
+    with Frontier(str(tmp_path / "frontier.db"), memory_urls=3) as frontier:
+        for url in urls(5, "late"):
+            frontier.push(url, priority=1)
+        # The heap is full, so these go to disk, but still come out first
+        for url in urls(4, "early"):
+            frontier.push(url, priority=0)
+        frontier.push("http://books.toscrape.com/catalogue/last/index.html", priority=2)
+        assert drain_now(frontier) == urls(4, "early") + urls(5, "late") + [
+            "http://books.toscrape.com/catalogue/last/index.html"]
+
+def test_interleaved_push_and_pop(tmp_path):
+    with Frontier(str(tmp_path / "frontier.db"), memory_urls=4) as frontier:
+        popped = []
+        for index, url in enumerate(urls(30)):
+            frontier.push(url)
+            if index % 3 == 2:
+                popped.append(frontier.pop())
+        assert popped + drain_now(frontier) == urls(30)
+
+def test_workers_wait_for_urls_until_finished(tmp_path):
+    with Frontier(str(tmp_path / "frontier.db"), memory_urls=5) as frontier:
+        got = []
+
+        def worker():
+            got.extend(frontier.drain())
+
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for url in urls(40) + urls(40):
+            frontier.push(url)
+        frontier.finish()
+        for thread in threads:
+            thread.join(10)
+        assert not any(thread.is_alive() for thread in threads)
+        assert sorted(got) == sorted(urls(40))
+        assert frontier.pop(timeout=0) is None
+        assert not frontier.push("http://books.toscrape.com/catalogue/too-late/index.html")
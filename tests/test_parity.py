@@ -0,0 +1,90 @@
+"""The fast product page extractor must give what the BeautifulSoup one gives, on any page.
+
+Every extraction runs in a child process that is killed after TIMEOUT
+seconds, so a page that makes a parser hang fails the test instead of
+hanging the run.
+"""
+import multiprocessing
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from book_scraper.extract import extract_book_data, extract_book_data_fast  # noqa: E402
+
+PAGES = os.path.join(HERE, "pages")
+URL = "http://books.toscrape.com/catalogue/its-only-the-himalayas_981/index.html"
+TIMEOUT = 10  # seconds; a page takes milliseconds
+
+def read_page(name):
+    with open(os.path.join(PAGES, name), encoding="utf-8") as f:
+        return f.read()
+
+def cut(page, marker, offset=0):
+    """page up to (offset characters after) the first marker."""
+    return page[:page.index(marker) + offset]
+
+def extract(parser, page):
+    """("ok", Book) or ("error", exception type name)."""
+    try:
+        return "ok", parser(page, URL)
+    except Exception as e:
+        return "error", type(e).__name__
+
+def extract_within_timeout(parser, page):
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        result = pool.apply_async(extract, (parser, page))
+        try:
+            return result.get(TIMEOUT)
+        except multiprocessing.TimeoutError:
+            pytest.fail(f"{parser.__name__} still running after {TIMEOUT}s")
+
+def malformed_pages():
+    page = read_page("product.html")
+    description_end = page.index("</p>", page.index('id="product_description"'))
+    return {
+        # Quotes that never close, in tags the fast extractor looks at
+        "open quote in rating": cut(page, '<p class="star-rating') +
+                                '<p class="star-rating Two" data-a=1 data-b=2 data-c=3 data-d=4 title="',
+        "open quote in title": cut(page, "<h1>") + "<h1 title=x" + "a" * 20 + "'",
+        "open quote before table": cut(page, "<table") + '<p title="' + "x" * 5000,
+        # Elements left open, closed by an enclosing element or by the end of the page
+        "unclosed description": page[:description_end] + page[description_end + len("</p>"):],
+        "unclosed breadcrumb items": page.replace("</li>", "", 2),
+        "unclosed title": page.replace("</h1>", "", 1),
+        "cut in description": page[:description_end - 40],
+        "cut in table": cut(page, "</table>", -30),
+        "cut in a tag": cut(page, '<p class="star-rating', 12),
+        "cut after table": cut(page, "</table>", len("</table>")),
+        "no description": page.replace('id="product_description"', 'id="other"'),
+        "empty": "",
+    }
+
+FIXTURE_PAGES = sorted(name for name in os.listdir(PAGES) if name.endswith(".html"))
+MALFORMED_PAGES = malformed_pages()
+
+@pytest.mark.parametrize("name", FIXTURE_PAGES)
+def test_fixture_pages(name):
+    page = read_page(name)
+    expected = extract_within_timeout(extract_book_data, page)
+    assert expected[0] == "ok"
+    assert extract_within_timeout(extract_book_data_fast, page) == expected
+
+@pytest.mark.parametrize("name", FIXTURE_PAGES)
+def test_fixture_pages_as_bytes(name):
+    page = read_page(name).encode("utf-8")
+    assert extract_within_timeout(extract_book_data_fast, page) == extract_within_timeout(extract_book_data, page)
+
+@pytest.mark.parametrize("name", sorted(MALFORMED_PAGES))
+def test_malformed_pages(name):
+    page = MALFORMED_PAGES[name]
+    expected = extract_within_timeout(extract_book_data, page)
+    result = extract_within_timeout(extract_book_data_fast, page)
+    if expected[0] == "error":
+        # Both reject the page; the exception types differ (bs4 trips over a missing element)
+        assert result[0] == "error"
+    else:
+        assert result == expected
@@ -0,0 +1,61 @@
+"""ParsePool: pages parsed in worker processes, and what happens when a worker dies."""
+import os
+import signal
+import sys
+import threading
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from book_scraper.extract import ParsePool, extract_book_data_fast  # noqa: E402
+
+URL = "http://books.toscrape.com/catalogue/its-only-the-himalayas_981/index.html"
+
+def read_page():
+    with open(os.path.join(HERE, "pages", "product.html"), encoding="utf-8") as f:
+        return f.read()
+
+def call_in_threads(pool, pages, timeout=20):
+    """[(Book or exception)] of pool(page, URL) for every page, each called from its own thread."""
+    results = [None] * len(pages)
+
+    def call(index):
+        try:
+            results[index] = pool(pages[index], URL)
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=call, args=(index,), daemon=True) for index in range(len(pages))]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+    hung = sum(thread.is_alive() for thread in threads)
+    assert not hung, f"{hung} of {len(threads)} threads still waiting for their page"
+    return results
+
+def test_pages_parsed_in_processes():
+    page = read_page()
+    pool = ParsePool(2, "fast", batch_size=4)
+    try:
+        results = call_in_threads(pool, [page] * 8)
+    finally:
+        pool.close()
+    assert results == [extract_book_data_fast(page, URL)] * 8
+
+def test_dead_worker_fails_every_waiting_page():
+    page = read_page()
+    pool = ParsePool(1, "fast", batch_size=8, max_delay=0.5)
+    try:
+        call_in_threads(pool, [page])  # starts the worker
+        for pid in list(pool.executor._processes):
+            os.kill(pid, signal.SIGKILL)
+        deadline = time.monotonic() + 10
+        while not pool.executor._broken and time.monotonic() < deadline:
+            time.sleep(0.01)
+        results = call_in_threads(pool, [page] * 8)
+    finally:
+        pool.close()
+    assert all(isinstance(result, Exception) for result in results)
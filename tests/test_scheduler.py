@@ -0,0 +1,127 @@
+"""RequestScheduler: 429/5xx responses and dropped connections retried, honouring Retry-After."""
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from book_scraper import fetch  # noqa: E402
+from book_scraper.fetch import PooledSession, RequestScheduler, retry_after  # noqa: E402
+
+class ScriptedServer(ThreadingHTTPServer):
+    """Answers each path with the next (status, headers) of its script, then 200 forever."""
+
+    def __init__(self, scripts):
+        super().__init__(("127.0.0.1", 0), ScriptedHandler)
+        self.scripts = {path: list(script) for path, script in scripts.items()}
+        self.hits = {}
+        self.lock = threading.Lock()
+
+    def next_reply(self, path):
+        with self.lock:
+            self.hits.setdefault(path, []).append(time.monotonic())
+            script = self.scripts.get(path)
+            return script.pop(0) if script else (200, {})
+
+class ScriptedHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        status, headers = self.server.next_reply(self.path)
+        body = b"ok" if status == 200 else b"try again"
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(scripts):
+        server = ScriptedServer(scripts)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    # Retries without Retry-After wait a random backoff; the tests only check that they happen
+    monkeypatch.setattr(fetch, "backoff_delay", lambda attempt: 0.0)
+
+def session(retries=3):
+    return PooledSession(scheduler=RequestScheduler(max_rate=1000, concurrency=4, retries=retries))
+
+def test_retries_429_and_5xx_until_success(serve):
+    server, root = serve({"/page": [(429, {}), (503, {}), (500, {}), (502, {})]})
+    with session(retries=4) as s:
+        response = s.get(root + "/page")
+    assert response.status_code == 200 and response.text == "ok"
+    assert len(server.hits["/page"]) == 5
+    assert s.scheduler.retried == 4
+
+def test_gives_up_after_the_last_retry(serve):
+    server, root = serve({"/page": [(503, {})] * 10})
+    with session(retries=2) as s:
+        response = s.get(root + "/page")
+    assert response.status_code == 503
+    assert len(server.hits["/page"]) == 3
+
+def test_other_errors_are_not_retried(serve):
+    server, root = serve({"/missing": [(404, {})]})
+    with session() as s:
+        assert s.get(root + "/missing").status_code == 404
+    assert len(server.hits["/missing"]) == 1
+
+def test_retry_after_is_honoured(serve):
+    server, root = serve({"/slow-down": [(429, {"Retry-After": "0.4"})]})
+    with session() as s:
+        assert s.get(root + "/slow-down").status_code == 200
+    first, second = server.hits["/slow-down"]
+    assert second - first >= 0.4
+
+def test_retry_after_pauses_the_whole_host(serve):
+    server, root = serve({"/a": [(503, {"Retry-After": "0.4"})]})
+    with session() as s:
+        first = threading.Thread(target=s.get, args=(root + "/a",))
+        first.start()
+        time.sleep(0.1)  # /a has had its 503 by now
+        s.get(root + "/b")
+        first.join()
+    assert server.hits["/b"][0] - server.hits["/a"][0] >= 0.35
+
+def test_dropped_connections_are_retried():
+    calls = []
+    response = SimpleNamespace(status_code=200, headers={})
+
+    def send():
+        calls.append(1)
+        if len(calls) < 3:
+            raise fetch.requests.ConnectionError("connection reset")
+        return response
+
+    scheduler = RequestScheduler(max_rate=1000, retries=3)
+    assert scheduler.send("http://example.invalid/", send) is response
+    assert len(calls) == 3 and scheduler.retried == 2
+
+def test_retry_after_header_forms():
+    assert retry_after({"Retry-After": "2"}) == 2.0
+    assert retry_after({}) is None
+    assert retry_after({"Retry-After": "soon"}) is None
+    later = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(time.time() + 5))
+    assert 3 <= retry_after({"Retry-After": later}) <= 5
+    assert retry_after({"Retry-After": "100000"}) == fetch.BACKOFF_MAX